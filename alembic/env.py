@@ -19,7 +19,8 @@ if config.config_file_name is not None:
 
 # Import your models' Base class
 try:
-    from app.models import Base
+    from app.models import Base, load_all_models
+    load_all_models()
     target_metadata = Base.metadata
     print(f"Successfully imported Base from app.models")
 except ImportError as e:
@@ -0,0 +1,37 @@
+"""Add product_price_history
+
+Revision ID: a7c3e9f1b5d2
+Revises: f6b2d8c4e0a7
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'a7c3e9f1b5d2'
+down_revision = 'f6b2d8c4e0a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'product_price_history',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('recorded_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_product_price_history_product_id_recorded_at',
+        'product_price_history',
+        ['product_id', 'recorded_at'],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index('ix_product_price_history_product_id_recorded_at', table_name='product_price_history')
+    op.drop_table('product_price_history')
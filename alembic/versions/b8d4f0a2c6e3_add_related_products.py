@@ -0,0 +1,45 @@
+"""Add orders.user_id, product_related and job_watermarks
+
+Revision ID: b8d4f0a2c6e3
+Revises: a7c3e9f1b5d2
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.db.migrations import create_index_concurrently, drop_index_concurrently, with_lock_retry
+
+revision = 'b8d4f0a2c6e3'
+down_revision = 'a7c3e9f1b5d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with_lock_retry(lambda: op.add_column('orders', sa.Column('user_id', sa.Integer(), nullable=True)))
+    op.create_table(
+        'product_related',
+        sa.Column('product_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('related_ids', postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column('scores', postgresql.ARRAY(sa.REAL()), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_table(
+        'job_watermarks',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('last_id', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # Last: runs outside the migration transaction
+    create_index_concurrently('ix_orders_user_id_product_id', 'orders', ['user_id', 'product_id'], unique=False)
+
+
+def downgrade():
+    op.drop_table('job_watermarks')
+    op.drop_table('product_related')
+    drop_index_concurrently('ix_orders_user_id_product_id', 'orders')
+    with_lock_retry(lambda: op.drop_column('orders', 'user_id'))
@@ -0,0 +1,60 @@
+"""Add product_events outbox and trigger
+
+Revision ID: c3d9e7a1b5f2
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = 'c3d9e7a1b5f2'
+down_revision = 'a1b2c3d4e5f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'product_events',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('event_type', sa.String(length=20), nullable=False),
+        sa.Column('payload', postgresql.JSONB(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_product_events_created_at'), 'product_events', ['created_at'], unique=False)
+
+    # Append an event in the same transaction as every product write
+    op.execute("""
+        CREATE FUNCTION products_outbox() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO product_events (product_id, event_type, payload)
+                VALUES (OLD.id, 'deleted', jsonb_build_object('id', OLD.id));
+                RETURN OLD;
+            END IF;
+            INSERT INTO product_events (product_id, event_type, payload)
+            VALUES (
+                NEW.id,
+                CASE WHEN TG_OP = 'INSERT' THEN 'created' ELSE 'updated' END,
+                to_jsonb(NEW)
+            );
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER products_outbox
+        AFTER INSERT OR UPDATE OR DELETE ON products
+        FOR EACH ROW EXECUTE FUNCTION products_outbox()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS products_outbox ON products")
+    op.execute("DROP FUNCTION IF EXISTS products_outbox()")
+    op.drop_index(op.f('ix_product_events_created_at'), table_name='product_events')
+    op.drop_table('product_events')
@@ -0,0 +1,22 @@
+"""Add products.thumbnail_url
+
+Revision ID: d4e8f2a6c1b3
+Revises: c3d9e7a1b5f2
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'd4e8f2a6c1b3'
+down_revision = 'c3d9e7a1b5f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('thumbnail_url', sa.String(length=500), nullable=True))
+
+
+def downgrade():
+    op.drop_column('products', 'thumbnail_url')
@@ -0,0 +1,41 @@
+"""Add product sort and trigram search indexes
+
+Revision ID: e5a1c7b9d3f4
+Revises: d4e8f2a6c1b3
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+
+from app.db.migrations import create_index_concurrently, drop_index_concurrently
+
+revision = 'e5a1c7b9d3f4'
+down_revision = 'd4e8f2a6c1b3'
+branch_labels = None
+depends_on = None
+
+SORT_COLUMNS = ('name', 'vendor', 'article', 'price', 'rating', 'created_at')
+SEARCH_COLUMNS = ('name', 'vendor', 'article', 'category')
+
+
+def upgrade():
+    for column in SORT_COLUMNS:
+        create_index_concurrently(f'ix_products_{column}_id', 'products', [column, 'id'], unique=False)
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in SEARCH_COLUMNS:
+        create_index_concurrently(
+            f'ix_products_{column}_trgm',
+            'products',
+            [column],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade():
+    for column in SEARCH_COLUMNS:
+        drop_index_concurrently(f'ix_products_{column}_trgm', 'products')
+    for column in SORT_COLUMNS:
+        drop_index_concurrently(f'ix_products_{column}_id', 'products')
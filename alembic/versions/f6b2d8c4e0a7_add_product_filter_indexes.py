@@ -0,0 +1,41 @@
+"""Add composite and partial indexes for product filters
+
+Revision ID: f6b2d8c4e0a7
+Revises: e5a1c7b9d3f4
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+from app.db.migrations import create_index_concurrently, drop_index_concurrently
+
+revision = 'f6b2d8c4e0a7'
+down_revision = 'e5a1c7b9d3f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_index_concurrently('ix_products_category_price_id', 'products', ['category', 'price', 'id'], unique=False)
+    create_index_concurrently('ix_products_vendor_price_id', 'products', ['vendor', 'price', 'id'], unique=False)
+    create_index_concurrently(
+        'ix_products_in_stock_price_id',
+        'products',
+        ['price', 'id'],
+        unique=False,
+        postgresql_where=sa.text('quantity > 0'),
+    )
+    create_index_concurrently(
+        'ix_products_in_stock_category_id',
+        'products',
+        ['category', 'id'],
+        unique=False,
+        postgresql_where=sa.text('quantity > 0'),
+    )
+
+
+def downgrade():
+    drop_index_concurrently('ix_products_in_stock_category_id', 'products')
+    drop_index_concurrently('ix_products_in_stock_price_id', 'products')
+    drop_index_concurrently('ix_products_vendor_price_id', 'products')
+    drop_index_concurrently('ix_products_category_price_id', 'products')
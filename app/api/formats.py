@@ -0,0 +1,91 @@
+# app/api/formats.py
+"""
+Alternative encodings for list endpoints, chosen by the Accept header.
+
+    application/json                 default, unchanged
+    application/msgpack              same objects, MessagePack encoded
+    application/vnd.columnar+json    {"columns": [...], "rows": [[...], ...]}
+    application/vnd.columnar+msgpack the columnar shape, MessagePack encoded
+
+Values are validated through the endpoint's response schema and dumped in
+JSON mode first, so every format carries exactly what the JSON response
+would (datetimes as ISO strings).
+"""
+import json
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence, Type
+
+import msgpack
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+
+MSGPACK = "application/msgpack"
+COLUMNAR_JSON = "application/vnd.columnar+json"
+COLUMNAR_MSGPACK = "application/vnd.columnar+msgpack"
+LIST_MEDIA_TYPES = (MSGPACK, COLUMNAR_JSON, COLUMNAR_MSGPACK)
+
+# OpenAPI description of the extra media types, for `responses=` on routes
+LIST_RESPONSES = {
+    200: {"content": {media_type: {} for media_type in LIST_MEDIA_TYPES}},
+}
+
+
+def negotiate(request: Request) -> Optional[str]:
+    """Return the preferred non-JSON list media type, or None for JSON."""
+    accept = request.headers.get("accept")
+    if not accept:
+        return None
+
+    best, best_q = None, 0.0
+    for part in accept.split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type == "application/json" and q >= best_q:
+            best, best_q = None, q
+        elif media_type in LIST_MEDIA_TYPES and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+
+def list_response(request: Request, items: Sequence[Any], schema: Type[BaseModel]) -> Any:
+    """
+    Encode items in the negotiated format.
+
+    Returns items untouched for JSON clients, so the route's response_model
+    handles them exactly as before.
+    """
+    media_type = negotiate(request)
+    if media_type is None:
+        return items
+
+    adapter = _list_adapter(schema)
+    objects = adapter.dump_python(
+        adapter.validate_python(items, from_attributes=True), mode="json"
+    )
+
+    if media_type in (COLUMNAR_JSON, COLUMNAR_MSGPACK):
+        columns = list(schema.model_fields)
+        payload = {
+            "columns": columns,
+            "rows": [[obj[column] for column in columns] for obj in objects],
+        }
+    else:
+        payload = objects
+
+    if media_type == COLUMNAR_JSON:
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    else:
+        body = msgpack.packb(payload, use_bin_type=True)
+
+    return Response(body, media_type=media_type, headers={"Vary": "Accept"})
@@ -1,11 +1,11 @@
 from datetime import timedelta
 from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import or_, select
 from sqlalchemy.orm import selectinload
 
-from app.models.database import get_async_db
+from app.db.session import get_async_db
 from app.models.user import User
 from app.schemas.auth import (
     Token,
@@ -14,8 +14,13 @@ from app.schemas.auth import (
     UserResponse,
     RefreshTokenRequest
 )
-from app.auth.password import verify_password, get_password_hash
+from app.auth.password import (
+    verify_password_async,
+    get_password_hash_async,
+    needs_rehash
+)
 from app.auth.jwt_handler import jwt_handler
+from app.auth.throttle import login_throttle
 from app.auth.dependencies import get_current_user
 from app.core.config import settings
 
@@ -25,9 +30,13 @@ router = APIRouter()
 @router.post("/login", response_model=Token)
 async def login(
     login_data: LoginRequest,
+    request: Request,
     db: AsyncSession = Depends(get_async_db)
 ) -> Any:
-    # Use async query
+    client_ip = request.client.host if request.client else None
+    # Reject throttled attempts before touching the database or bcrypt
+    await login_throttle.check(login_data.username, client_ip)
+
     stmt = select(User).where(
         or_(
             User.username == login_data.username,
@@ -36,8 +45,13 @@ async def login(
     )
     result = await db.execute(stmt)
     user = result.scalar_one_or_none()
+    # Don't hold a pooled connection during the bcrypt verify
+    await db.release()
 
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    if not user or not await verify_password_async(
+        login_data.password, user.hashed_password
+    ):
+        # The failed attempt keeps the tokens check() took
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -50,6 +64,13 @@ async def login(
             detail="Inactive user"
         )
 
+    await login_throttle.record_success(login_data.username, client_ip)
+
+    # Upgrade hashes made with an old cost or scheme while we have the
+    # plain password; saved by the commit below.
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await get_password_hash_async(login_data.password)
+
     access_token_expires = timedelta(
         minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
     )
@@ -119,6 +140,7 @@ async def refresh_token(
     )
     result = await db.execute(stmt)
     user = result.scalar_one_or_none()
+    await db.release()
 
     if not user:
         raise HTTPException(
@@ -164,7 +186,8 @@ async def register(
                 detail="Username already taken"
             )
 
-    hashed_password = get_password_hash(user_data.password)
+    await db.release()
+    hashed_password = await get_password_hash_async(user_data.password)
     user = User(
         email=user_data.email,
         username=user_data.username,
@@ -194,6 +217,10 @@ async def logout(
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
+    # Same session as the user lookup; its COMMIT replaces the ROLLBACK
+    # on close, so the connection is back before the response is sent
+    await db.release()
     return current_user
\ No newline at end of file
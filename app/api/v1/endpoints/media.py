@@ -0,0 +1,108 @@
+import os
+import re
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.services.images import MEDIA_TYPES
+
+router = APIRouter()
+
+# Content-addressed names only; this also rules out path traversal
+MEDIA_NAME = re.compile(r"^(?P<digest>[0-9a-f]{64})\.(?P<ext>[a-z]+)$")
+CHUNK_SIZE = 64 * 1024
+# Names never change content, so caches may keep them for good
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single ``bytes=`` range into inclusive (start, end).
+
+    Returns None for ranges we don't serve partially (multiple ranges,
+    other units, garbage); raises 416 for unsatisfiable ones.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(end_text), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+async def _file_chunks(path: str, start: int, length: int):
+    async with await anyio.open_file(path, "rb") as fh:
+        await fh.seek(start)
+        while length > 0:
+            chunk = await fh.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@router.get("/{shard}/{name}")
+async def get_media(shard: str, name: str, request: Request):
+    match = MEDIA_NAME.match(name)
+    if not match or match["digest"][:2] != shard or match["ext"] not in MEDIA_TYPES:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    path = os.path.join(settings.MEDIA_ROOT, shard, name)
+    try:
+        stat = await anyio.to_thread.run_sync(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    size = stat.st_size
+    etag = f'"{match["digest"]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header:
+        if_range = request.headers.get("if-range")
+        if if_range is None or if_range.strip() == etag:
+            byte_range = parse_range(range_header, size)
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        _file_chunks(path, start, end - start + 1),
+        status_code=status_code,
+        media_type=MEDIA_TYPES[match["ext"]],
+        headers=headers,
+    )
@@ -1,56 +1,208 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, desc, asc
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
+from app.api.formats import LIST_RESPONSES, list_response
+from app.core.admission import PerUserLimiter
+from app.core.config import settings
+from app.db import queries
 from app.db.session import get_async_db
 from app.models.product import Product, Order
+from app.services import catalog_snapshot, images, price_history, product_events, product_reads
 from app.schemas.product import (
     ProductCreate,
     ProductUpdate,
     ProductResponse,
     OrderCreate,
-    OrderResponse
+    OrderResponse,
+    PriceHistoryPoint
 )
 from app.auth.dependencies import get_current_user
 
 router = APIRouter()
 
+MAX_BATCH_IDS = 100
+# Unique index on products.article (migration a1b2c3d4e5f6)
+ARTICLE_UNIQUE_INDEX = "ix_products_article"
+UNIQUE_VIOLATION = "23505"
+SORT_BY_PATTERN = f"^({'|'.join(queries.SORTABLE_FIELDS)})$"
 
-@router.get("/", response_model=List[ProductResponse])
+# Search scans far more rows than a plain page; cap it per user
+search_limiter = PerUserLimiter("GET /products/ search", settings.USER_EXPENSIVE_CONCURRENCY)
+
+
+def _is_duplicate_article(exc: IntegrityError) -> bool:
+    return (
+        getattr(exc.orig, "sqlstate", None) == UNIQUE_VIOLATION
+        and ARTICLE_UNIQUE_INDEX in str(exc.orig)
+    )
+
+
+async def search_slot(
+    search: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
+    if not search:
+        yield
+        return
+    async with search_limiter.slot(current_user.id):
+        yield
+
+
+@router.get(
+    "/",
+    response_model=List[ProductResponse],
+    responses=LIST_RESPONSES,
+    dependencies=[Depends(search_slot)],
+)
 async def get_products(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     search: Optional[str] = None,
-    sort_by: Optional[str] = None,
+    sort_by: Optional[str] = Query(None, pattern=SORT_BY_PATTERN),
     sort_order: Optional[str] = Query("asc", pattern="^(asc|desc)$"),
+    category: Optional[str] = None,
+    vendor: Optional[List[str]] = Query(None, description="Repeat for several vendors"),
+    price_min: Optional[float] = Query(None, ge=0),
+    price_max: Optional[float] = Query(None, ge=0),
+    rating_min: Optional[float] = Query(None, ge=0, le=5),
+    in_stock: Optional[bool] = None,
     db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    stmt = select(Product)
-    
-    if search:
-        search_filter = f"%{search}%"
-        stmt = stmt.where(
-            or_(
-                Product.name.ilike(search_filter),
-                Product.vendor.ilike(search_filter),
-                Product.article.ilike(search_filter),
-                Product.category.ilike(search_filter)
+    # The user lookup's connection; coalesced reads use their own sessions
+    await db.release()
+    filters = queries.ProductFilters(
+        category=category,
+        vendors=tuple(sorted(set(vendor or ()))),
+        price_min=price_min,
+        price_max=price_max,
+        rating_min=rating_min,
+        in_stock=in_stock,
+    )
+    products = await product_reads.list_products(
+        skip, limit, search, sort_by, sort_order, filters
+    )
+    return list_response(request, products, ProductResponse)
+
+
+@router.get("/batch", response_model=List[ProductResponse], responses=LIST_RESPONSES)
+async def get_products_batch(
+    request: Request,
+    ids: str = Query(..., description="Comma-separated product ids"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Products by id in the requested order; unknown ids are left out."""
+    try:
+        product_ids = list(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not product_ids:
+        raise HTTPException(status_code=400, detail="No product ids given")
+    if len(product_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+
+    await db.release()
+    products = await product_reads.get_products(product_ids)
+    return list_response(request, products, ProductResponse)
+
+
+@router.get("/snapshot", response_class=FileResponse)
+async def get_catalog_snapshot(
+    request: Request,
+    category: Optional[str] = None,
+):
+    """
+    The whole catalog, or one category, as a pre-built gzipped JSON file
+    (`{"version": ..., "products": [...]}`); no authentication. Poll with
+    If-None-Match, and follow up with /snapshot/changes?since=<version>
+    for changes after the snapshot.
+    """
+    key = category if category is not None else catalog_snapshot.ALL
+    found = await catalog_snapshot.builder.lookup(key)
+    if found is None:
+        manifest = catalog_snapshot.builder.manifest
+        if manifest is None or key in manifest["slices"]:
+            raise HTTPException(
+                status_code=503,
+                detail="Snapshot not built yet",
+                headers={"Retry-After": str(max(1, round(settings.CATALOG_SNAPSHOT_DEBOUNCE)))},
             )
+        raise HTTPException(status_code=404, detail="No products in this category")
+    path, etag = found
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    accepted = {
+        part.split(";")[0].strip()
+        for part in request.headers.get("accept-encoding", "").split(",")
+    }
+    if "gzip" not in accepted:
+        return StreamingResponse(
+            catalog_snapshot.decompressed(path), media_type="application/json", headers=headers
         )
-    
-    if sort_by:
-        if hasattr(Product, sort_by):
-            column = getattr(Product, sort_by)
-            if sort_order == "desc":
-                stmt = stmt.order_by(desc(column))
-            else:
-                stmt = stmt.order_by(asc(column))
-    
-    stmt = stmt.offset(skip).limit(limit)
-    result = await db.execute(stmt)
-    products = result.scalars().all()
-    return products
+    headers["Content-Encoding"] = "gzip"
+    return FileResponse(path, media_type="application/json", headers=headers)
+
+
+@router.get("/snapshot/changes")
+async def get_catalog_changes(
+    since: int = Query(..., ge=0, description="Snapshot version or last event id seen"),
+):
+    """
+    Product changes after a snapshot version, oldest first: `events` hold
+    the full row for created/updated and the id for deleted products.
+    Continue from `version` while `more` is true. 410 means the changes
+    are no longer kept; fetch a new snapshot.
+    """
+    events = await catalog_snapshot.change_events(since)
+    if events is None:
+        raise HTTPException(status_code=410, detail="Changes expired; fetch a new snapshot")
+    return {
+        "version": events[-1].id if events else since,
+        "more": len(events) >= settings.CATALOG_SNAPSHOT_DELTA_LIMIT,
+        "events": [
+            {"id": event.id, "type": event.event_type, "product_id": event.product_id, "product": event.payload}
+            for event in events
+        ],
+    }
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_products(
+    request: Request,
+    last_event_id: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Server-Sent Events feed of product changes (created/updated/deleted).
+
+    Reconnecting clients resume after the Last-Event-ID header, or the
+    last_event_id query parameter for clients that cannot set headers.
+    A "reset" event means the client fell too far behind and should
+    re-fetch the list.
+    """
+    # The stream can stay open for hours; don't pin a pooled connection.
+    await db.close()
+
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+
+    return StreamingResponse(
+        product_events.sse_stream(request, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
@@ -59,9 +211,8 @@ async def get_product(
     db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    stmt = select(Product).where(Product.id == product_id)
-    result = await db.execute(stmt)
-    product = result.scalar_one_or_none()
+    await db.release()
+    product = await product_reads.get_product(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
@@ -73,16 +224,16 @@ async def create_product(
     db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    stmt = select(Product).where(Product.article == product_data.article)
-    result = await db.execute(stmt)
-    existing = result.scalar_one_or_none()
-    if existing:
-        raise HTTPException(status_code=400, detail="Product with this article already exists")
-    
-    product = Product(**product_data.model_dump())
-    db.add(product)
-    await db.commit()
-    await db.refresh(product)
+    try:
+        result = await db.execute(queries.insert_product(product_data.model_dump()))
+        product = result.scalar_one()
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        if _is_duplicate_article(exc):
+            raise HTTPException(status_code=400, detail="Product with this article already exists")
+        raise
+    price_history.recorder.record(product.id, product.price, product.quantity)
     return product
 
 
@@ -93,46 +244,126 @@ async def update_product(
     db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    stmt = select(Product).where(Product.id == product_id)
-    result = await db.execute(stmt)
-    product = result.scalar_one_or_none()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
     update_data = product_data.model_dump(exclude_unset=True)
-    
-    if "article" in update_data:
-        stmt = select(Product).where(
-            Product.article == update_data["article"],
-            Product.id != product_id
-        )
-        result = await db.execute(stmt)
-        existing = result.scalar_one_or_none()
-        if existing:
+    if not update_data:
+        await db.release()
+        product = await product_reads.get_product(product_id)
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return product
+
+    try:
+        result = await db.execute(queries.update_product(product_id, update_data))
+        product = result.one_or_none()
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        if _is_duplicate_article(exc):
             raise HTTPException(status_code=400, detail="Product with this article already exists")
-    
-    for field, value in update_data.items():
-        setattr(product, field, value)
-    
+        raise
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    if (product.price, product.quantity) != (product.previous_price, product.previous_quantity):
+        price_history.recorder.record(product.id, product.price, product.quantity)
+    return product
+
+
+@router.post("/{product_id}/image", response_model=ProductResponse)
+async def upload_product_image(
+    product_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Upload a product image as multipart/form-data (field "file").
+
+    Sets image_url to the stored original and returns. thumbnail_url, a
+    small WebP rendition for list views, is null until it has been made
+    shortly after the response.
+    """
+    stmt = queries.product_by_id(product_id)
+    result = await db.execute(stmt)
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    # Hold no connection while the upload streams in and is validated
+    await db.release()
+    original = await images.save_product_image(request)
+    result = await db.execute(queries.set_product_image(product_id, images.media_url(original)))
+    product = result.one_or_none()
     await db.commit()
-    await db.refresh(product)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    background_tasks.add_task(images.attach_thumbnail, product_id, original)
     return product
 
 
+@router.get("/{product_id}/history", response_model=List[PriceHistoryPoint])
+async def get_product_history(
+    product_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: int = Query(3600, ge=60, description="Bucket width in seconds"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Price and stock history downsampled to one point per `resolution`
+    seconds (min, max and last value per bucket). Defaults to the last
+    30 days.
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=30)
+    # Naive timestamps are taken as UTC
+    start, end = (
+        value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        for value in (start, end)
+    )
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if (end - start).total_seconds() / resolution > settings.PRICE_HISTORY_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many points; use a larger resolution (at most "
+                   f"{settings.PRICE_HISTORY_MAX_POINTS} buckets per request)",
+        )
+
+    result = await db.execute(price_history.history_query(product_id, start, end, resolution))
+    points = result.mappings().all()
+    await db.release()
+    return points
+
+
+@router.get("/{product_id}/related", response_model=List[ProductResponse], responses=LIST_RESPONSES)
+async def get_related_products(
+    product_id: int,
+    request: Request,
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Products frequently bought by the same customers, most related first."""
+    result = await db.execute(queries.related_products(product_id, limit))
+    products = result.scalars().all()
+    await db.release()
+    return list_response(request, products, ProductResponse)
+
+
 @router.delete("/{product_id}")
 async def delete_product(
     product_id: int,
     db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    stmt = select(Product).where(Product.id == product_id)
-    result = await db.execute(stmt)
-    product = result.scalar_one_or_none()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    await db.delete(product)
+    result = await db.execute(queries.delete_product(product_id))
+    deleted = result.scalar_one_or_none()
     await db.commit()
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="Product not found")
     return {"message": "Product deleted successfully"}
 
 
@@ -142,38 +373,25 @@ async def create_order(
     db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    stmt = select(Product).where(Product.id == order_data.product_id)
-    result = await db.execute(stmt)
-    product = result.scalar_one_or_none()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    if product.quantity < order_data.quantity:
-        raise HTTPException(status_code=400, detail="Insufficient product quantity")
-    
-    total_amount = product.price * order_data.quantity
-    
-    order = Order(
-        product_id=product.id,
-        product_name=product.name,
-        vendor=product.vendor,
-        article=product.article,
-        quantity=order_data.quantity,
-        price=product.price,
-        total_amount=total_amount,
-        status="pending"
+    result = await db.execute(
+        queries.place_order(order_data.product_id, current_user.id, order_data.quantity)
     )
-    
-    product.quantity -= order_data.quantity
-    
-    db.add(order)
+    order = result.one_or_none()
     await db.commit()
-    await db.refresh(order)
+    if order is None:
+        # Failure path only: tell a missing product from missing stock
+        result = await db.execute(select(Product.id).where(Product.id == order_data.product_id))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(status_code=400, detail="Insufficient product quantity")
+
+    price_history.recorder.record(order.product_id, order.price, order.product_quantity)
     return order
 
 
-@router.get("/orders/", response_model=List[OrderResponse])
+@router.get("/orders/", response_model=List[OrderResponse], responses=LIST_RESPONSES)
 async def get_orders(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     db: AsyncSession = Depends(get_async_db),
@@ -182,4 +400,5 @@ async def get_orders(
     stmt = select(Order).offset(skip).limit(limit)
     result = await db.execute(stmt)
     orders = result.scalars().all()
-    return orders
+    await db.release()
+    return list_response(request, orders, OrderResponse)
@@ -0,0 +1,42 @@
+from typing import Any, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app.auth.dependencies import get_current_superuser
+from app.core import profiling
+from app.models.user import User
+
+router = APIRouter()
+
+# Download formats: file suffix and media type
+FORMATS = {
+    "collapsed": (".collapsed", "text/plain"),
+    "pyisession": (".pyisession", "application/json"),
+}
+
+
+@router.get("/", response_model=List[dict])
+def list_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_superuser)
+) -> Any:
+    """Recent request profiles of this worker, newest first (admin only)."""
+    return profiling.list_profiles(limit)
+
+
+@router.get("/{profile_id}")
+def get_profile(
+    profile_id: str,
+    format: str = Query("collapsed", pattern="^(collapsed|pyisession)$"),
+    current_user: User = Depends(get_current_superuser)
+) -> Any:
+    """
+    Download a profile: collapsed stacks for flamegraph tools, or the
+    pyinstrument session (``pyinstrument --load=<file>``).
+    """
+    suffix, media_type = FORMATS[format]
+    path = profiling.profile_dir() / f"{profile_id}{suffix}"
+    if not profiling.PROFILE_ID.match(profile_id) or not path.is_file():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type=media_type, filename=path.name)
@@ -1,8 +1,9 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.database import get_db
+from app.db.session import get_async_db
 from app.models.user import User
 from app.schemas.auth import UserResponse
 from app.auth.dependencies import get_current_user
@@ -10,26 +11,30 @@ from app.auth.dependencies import get_current_user
 router = APIRouter()
 
 @router.get("/", response_model=List[UserResponse])
-def get_users(
+async def get_users(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """Get all users (admin only)."""
-    users = db.query(User).offset(skip).limit(limit).all()
+    result = await db.execute(select(User).offset(skip).limit(limit))
+    users = result.scalars().all()
+    await db.release()
     return users
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(
+async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
-    user = db.query(User).filter(User.id == user_id).first()
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    await db.release()
     if not user:
         raise HTTPException(
             status_code=404,
             detail="User not found"
         )
-    return user
\ No newline at end of file
+    return user
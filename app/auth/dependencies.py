@@ -1,9 +1,13 @@
 # app/auth/dependencies.py
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from app.auth.jwt_handler import jwt_handler
+from app.db import queries
+from app.db import session as db_session
 from app.db.session import get_async_db
 from app.models.user import User
 from app.core.config import settings
@@ -32,7 +36,7 @@ async def get_current_user(
     except (JWTError, ValueError):
         raise credentials_exception
 
-    stmt = select(User).where(User.id == user_id)
+    stmt = queries.user_by_id(user_id)
     result = await db.execute(stmt)
     user = result.scalar_one_or_none()
     if user is None:
@@ -48,4 +52,31 @@ async def get_current_active_user(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Inactive user"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_current_superuser(
+        current_user: User = Depends(get_current_active_user)
+) -> User:
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return current_user
+
+
+async def superuser_from_token(token: str) -> Optional[User]:
+    """
+    The active superuser an access token belongs to, else None. For code
+    that runs before routing (middleware), so it uses its own session.
+    """
+    try:
+        user_id = int(jwt_handler.verify_token(token, "access")["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+    async with db_session.AsyncSessionLocal() as session:
+        result = await session.execute(queries.user_by_id(user_id))
+        user = result.scalar_one_or_none()
+    if user is None or not user.is_active or not user.is_superuser:
+        return None
+    return user
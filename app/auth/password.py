@@ -1,23 +1,114 @@
-from passlib.context import CryptContext
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__rounds=12,  # Explicitly set rounds
-)
+import bcrypt
+
+from app.core.config import settings
+from app.core.metrics import BCRYPT_DURATION, BCRYPT_IN_FLIGHT
+
+# bcrypt only looks at the first 72 bytes of the password
+BCRYPT_MAX_BYTES = 72
+BCRYPT_SCHEME = "2b"
+
+_hash_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        # bcrypt releases the GIL, so a small thread pool keeps hashing off
+        # the event loop without blocking other requests.
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="bcrypt",
+        )
+    return _hash_executor
+
+
+def shutdown_hash_executor() -> None:
+    # The next lifespan (or benchmark) in this process gets a fresh pool
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False)
+        _hash_executor = None
+
+
+def _password_bytes(password: str) -> bytes:
+    password_bytes = password.encode('utf-8')
+    if len(password_bytes) > BCRYPT_MAX_BYTES:
+        # Drop a trailing partial character the same way the old passlib
+        # based hasher did, so existing hashes keep verifying.
+        password_bytes = password_bytes[:BCRYPT_MAX_BYTES].decode(
+            'utf-8', errors='ignore'
+        ).encode('utf-8')
+    return password_bytes
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(
+            _password_bytes(plain_password),
+            hashed_password.encode('utf-8')
+        )
+    except ValueError:
+        # Malformed or non-bcrypt hash
+        return False
+
+
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
+    salt = bcrypt.gensalt(rounds=rounds or settings.PASSWORD_BCRYPT_ROUNDS)
+    return bcrypt.hashpw(_password_bytes(password), salt).decode('utf-8')
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    Check whether a stored hash uses an outdated scheme or cost.
+
+    bcrypt hashes look like ``$2b$12$<salt><digest>``.
+    """
+    parts = hashed_password.split('$')
+    if len(parts) != 4 or parts[1] != BCRYPT_SCHEME:
+        return True
+    try:
+        cost = int(parts[2])
+    except ValueError:
+        return True
+    return cost != settings.PASSWORD_BCRYPT_ROUNDS
+
+
+async def _run_in_executor(operation: str, func, *args):
+    loop = asyncio.get_running_loop()
+    BCRYPT_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        return await loop.run_in_executor(get_hash_executor(), func, *args)
+    finally:
+        BCRYPT_IN_FLIGHT.dec()
+        BCRYPT_DURATION.labels(operation=operation).observe(
+            time.perf_counter() - start
+        )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_executor(
+        "verify", verify_password, plain_password, hashed_password
+    )
+
 
-    if len(plain_password.encode('utf-8')) > 72:
-        plain_password = plain_password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-    
-    return pwd_context.verify(plain_password, hashed_password)
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_executor("hash", get_password_hash, password)
 
 
-def get_password_hash(password: str) -> str:
+def calibrate(rounds: Optional[int] = None, samples: int = 1) -> float:
+    """
+    Measure how long one hash takes on this machine.
 
-    if len(password.encode('utf-8')) > 72:
-        password = password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-    
-    return pwd_context.hash(password)
+    Returns:
+        Average milliseconds per hash at the given (or configured) cost
+    """
+    start = time.perf_counter()
+    for _ in range(samples):
+        get_password_hash("calibration-password", rounds=rounds)
+    return (time.perf_counter() - start) * 1000 / samples
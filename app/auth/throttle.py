@@ -0,0 +1,177 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import LOGIN_THROTTLE_REJECTED
+
+# Retry-After for buckets configured with a refill rate of 0
+RETRY_AFTER_NO_REFILL = 3600
+
+
+@dataclass(frozen=True)
+class BucketPolicy:
+    capacity: float
+    refill_per_second: float
+
+
+class ThrottleBackend(ABC):
+    """
+    Storage for token buckets.
+
+    Implementations must be safe to call from several coroutines at once.
+    The methods are coroutines so a shared backend (e.g. Redis) that lets
+    all workers see the same buckets does not block the event loop; the
+    in-memory one only protects the current process.
+    """
+
+    @abstractmethod
+    async def acquire(self, key: str, policy: BucketPolicy) -> float:
+        """
+        Atomically take one token from the bucket if one is available.
+        Return 0 when it was taken, else the seconds until one will be.
+        """
+
+    @abstractmethod
+    async def refund(self, key: str, policy: BucketPolicy) -> None:
+        """Give back a token taken by acquire(), up to the capacity."""
+
+    @abstractmethod
+    async def reset(self, key: str) -> None:
+        """Forget the bucket, restoring full capacity."""
+
+
+def _wait_for_token(tokens: float, policy: BucketPolicy) -> float:
+    if policy.refill_per_second <= 0:
+        # Never refills; clients still need a finite Retry-After
+        return float(RETRY_AFTER_NO_REFILL)
+    return (1 - tokens) / policy.refill_per_second
+
+
+class InMemoryThrottleBackend(ThrottleBackend):
+    """
+    Per-process token buckets kept in an LRU map.
+
+    Every key costs one (tokens, timestamp) pair. Once max_keys is reached
+    the least recently touched bucket is evicted, so memory stays bounded
+    even under a spray of random usernames or IPs.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _refill(self, key: str, policy: BucketPolicy, now: float) -> float:
+        state = self._buckets.get(key)
+        if state is None:
+            return policy.capacity
+        tokens, updated = state
+        return min(policy.capacity, tokens + (now - updated) * policy.refill_per_second)
+
+    def _store(self, key: str, tokens: float, now: float) -> None:
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    async def acquire(self, key: str, policy: BucketPolicy) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._refill(key, policy, now)
+            if tokens < 1:
+                return _wait_for_token(tokens, policy)
+            self._store(key, tokens - 1, now)
+        return 0.0
+
+    async def refund(self, key: str, policy: BucketPolicy) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if key in self._buckets:
+                self._store(key, min(policy.capacity, self._refill(key, policy, now) + 1), now)
+
+    async def reset(self, key: str) -> None:
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class LoginThrottle:
+    """
+    Rejects login attempts for usernames or client IPs that have used up
+    their failure budget, before the user lookup and the bcrypt verify run.
+
+    check() takes a token from both buckets up front, so a burst of
+    concurrent attempts cannot all pass before the first one fails. A
+    failed attempt keeps its tokens; a successful login gives the IP token
+    back and resets the username bucket, so a user who finally remembers
+    the password is not locked out for the rest of the window.
+    """
+
+    def __init__(
+        self,
+        backend: ThrottleBackend,
+        username_policy: BucketPolicy,
+        ip_policy: BucketPolicy,
+        enabled: bool = True,
+    ):
+        self.backend = backend
+        self.username_policy = username_policy
+        self.ip_policy = ip_policy
+        self.enabled = enabled
+
+    @staticmethod
+    def _username_key(username: str) -> str:
+        return f"user:{username.strip().lower()}"
+
+    @staticmethod
+    def _ip_key(ip: Optional[str]) -> str:
+        return f"ip:{ip or 'unknown'}"
+
+    async def check(self, username: str, ip: Optional[str]) -> None:
+        if not self.enabled:
+            return
+
+        username_key = self._username_key(username)
+        retry_after = await self.backend.acquire(username_key, self.username_policy)
+        if not retry_after:
+            retry_after = await self.backend.acquire(self._ip_key(ip), self.ip_policy)
+            if retry_after:
+                await self.backend.refund(username_key, self.username_policy)
+
+        if retry_after:
+            # Every rejected attempt is one bcrypt verify (and one user
+            # lookup) that did not happen
+            LOGIN_THROTTLE_REJECTED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, try again later",
+                headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+            )
+
+    async def record_success(self, username: str, ip: Optional[str]) -> None:
+        if not self.enabled:
+            return
+        await self.backend.reset(self._username_key(username))
+        await self.backend.refund(self._ip_key(ip), self.ip_policy)
+
+
+login_throttle = LoginThrottle(
+    backend=InMemoryThrottleBackend(max_keys=settings.LOGIN_THROTTLE_MAX_KEYS),
+    username_policy=BucketPolicy(
+        capacity=settings.LOGIN_THROTTLE_USERNAME_BURST,
+        refill_per_second=settings.LOGIN_THROTTLE_USERNAME_PER_MINUTE / 60,
+    ),
+    ip_policy=BucketPolicy(
+        capacity=settings.LOGIN_THROTTLE_IP_BURST,
+        refill_per_second=settings.LOGIN_THROTTLE_IP_PER_MINUTE / 60,
+    ),
+    enabled=settings.LOGIN_THROTTLE_ENABLED,
+)
@@ -0,0 +1,163 @@
+# app/core/admission.py
+"""
+Overload protection.
+
+When the database slows down, requests would otherwise queue on the
+connection pool without bound. Instead:
+
+- every route gets a concurrency limit with a short, bounded wait queue;
+  anything beyond that is shed immediately with 503 + Retry-After,
+- expensive endpoints get a per-user cap (429), so one client cannot
+  hold all the slots,
+- statement and pool-checkout timeouts (see app.db.session) turn into
+  503 + Retry-After instead of 500s.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.config import settings
+from app.core.metrics import ADMISSION_IN_FLIGHT, ADMISSION_REJECTED
+from app.db.session import StatementTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+def _retry_after() -> Dict[str, str]:
+    return {"Retry-After": str(settings.ADMISSION_RETRY_AFTER)}
+
+
+def _route_name(request: Request) -> str:
+    route = request.scope.get("route")
+    return f"{request.method} {getattr(route, 'path', 'unmatched')}"
+
+
+class ConcurrencyLimiter:
+    """At most `limit` requests at once, `max_queue` more waiting up to `queue_timeout`."""
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self._waiting = 0
+
+    def _reject(self, reason: str) -> HTTPException:
+        ADMISSION_REJECTED.labels(route=self.name, reason=reason).inc()
+        return HTTPException(
+            status_code=503,
+            detail="Server is busy, retry later",
+            headers=_retry_after(),
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked():
+            if self._waiting >= self.max_queue:
+                raise self._reject("queue_full")
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject("queue_timeout")
+            finally:
+                self._waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        ADMISSION_IN_FLIGHT.labels(route=self.name).inc()
+        try:
+            yield
+        finally:
+            ADMISSION_IN_FLIGHT.labels(route=self.name).dec()
+            self._semaphore.release()
+
+
+class PerUserLimiter:
+    """At most `limit` concurrent requests per user; the rest get 429 right away."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self._active: Dict[int, int] = defaultdict(int)
+
+    @asynccontextmanager
+    async def slot(self, user_id: int):
+        if self._active[user_id] >= self.limit:
+            ADMISSION_REJECTED.labels(route=self.name, reason="user_limit").inc()
+            raise HTTPException(
+                status_code=429,
+                detail="Too many concurrent requests",
+                headers=_retry_after(),
+            )
+        self._active[user_id] += 1
+        try:
+            yield
+        finally:
+            self._active[user_id] -= 1
+            if not self._active[user_id]:
+                del self._active[user_id]
+
+
+_route_limiters: Dict[str, Optional[ConcurrencyLimiter]] = {}
+
+
+def route_limiter(key: str) -> Optional[ConcurrencyLimiter]:
+    """The limiter for "METHOD /path/template", or None if the route is unlimited."""
+    if key not in _route_limiters:
+        limit = settings.ADMISSION_ROUTE_LIMITS.get(key, settings.ADMISSION_DEFAULT_LIMIT)
+        _route_limiters[key] = ConcurrencyLimiter(
+            key,
+            limit,
+            settings.ADMISSION_QUEUE_SIZE,
+            settings.ADMISSION_QUEUE_TIMEOUT,
+        ) if limit > 0 else None
+    return _route_limiters[key]
+
+
+async def admission_control(request: Request):
+    """
+    Router dependency applying the per-route limit.
+
+    Routes are keyed by method and path template; limits come from
+    ADMISSION_ROUTE_LIMITS, falling back to ADMISSION_DEFAULT_LIMIT, and 0
+    means unlimited (long-lived streams).
+    """
+    if not settings.ADMISSION_ENABLED:
+        yield
+        return
+    limiter = route_limiter(_route_name(request))
+    if limiter is None:
+        yield
+        return
+    async with limiter.slot():
+        yield
+
+
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    route = _route_name(request)
+    logger.warning("Connection pool checkout timed out on %s", route)
+    ADMISSION_REJECTED.labels(route=route, reason="pool_timeout").inc()
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database is busy, retry later"},
+        headers=_retry_after(),
+    )
+
+
+async def statement_timeout_handler(request: Request, exc: StatementTimeoutError):
+    route = _route_name(request)
+    logger.warning("Statement timed out on %s: %s", route, exc.orig)
+    ADMISSION_REJECTED.labels(route=route, reason="statement_timeout").inc()
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database is busy, retry later"},
+        headers=_retry_after(),
+    )
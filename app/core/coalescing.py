@@ -0,0 +1,96 @@
+# app/core/coalescing.py
+"""
+Per-process read coalescing.
+
+SingleFlight lets concurrent callers with the same key share one
+execution. BatchLoader (dataloader style) collects keys requested within
+a short window and resolves them all with one batch call.
+
+Both share results between requests, so load functions should return
+immutable snapshots (e.g. pydantic models), not session-bound ORM objects.
+Nothing is cached once a call has finished.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Iterable, List, Mapping, Optional, TypeVar
+
+from app.core.metrics import READS_COALESCED
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class SingleFlight(Generic[K, V]):
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[K, "asyncio.Task[V]"] = {}
+
+    async def do(self, key: K, func: Callable[[], Awaitable[V]]) -> V:
+        task = self._calls.get(key)
+        if task is None:
+            # A task of its own, so a caller that gets cancelled (client
+            # disconnect) doesn't take the others down with it.
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            READS_COALESCED.labels(kind=self.name).inc()
+        return await asyncio.shield(task)
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    Usage:
+        async def load_products(ids): ...  # -> {id: product}
+        loader = BatchLoader("product", load_products)
+        product = await loader.load(42)  # None if missing
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[K]], Awaitable[Mapping[K, V]]],
+        window: float = 0.002,
+        max_batch_size: int = 100,
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[K, "asyncio.Future[Optional[V]]"] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def load(self, key: K) -> Optional[V]:
+        future = self._pending.get(key)
+        if future is not None:
+            READS_COALESCED.labels(kind=self.name).inc()
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch_size:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._dispatch)
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[K]) -> List[Optional[V]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: Dict[K, "asyncio.Future[Optional[V]]"]) -> None:
+        try:
+            results = await self.batch_fn(list(batch))
+        except Exception as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
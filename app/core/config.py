@@ -1,5 +1,5 @@
 import json
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field, validator
 
@@ -16,6 +16,44 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = Field(default="dbname")
     POSTGRES_PORT: str = Field(default="5432")
 
+    # Connection pool. DB_CONNECTION_BUDGET is the share of Postgres
+    # max_connections this deployment may use across all workers.
+    DB_CONNECTION_BUDGET: int = Field(default=80)
+    DB_POOL_SIZE: int = Field(default=5)
+    DB_MAX_OVERFLOW: int = Field(default=10)
+
+    # Statement caching: SQLAlchemy's compiled-SQL cache per engine and
+    # asyncpg's prepared statements per connection. PgBouncer in
+    # transaction mode cannot keep prepared statements, so turn them off.
+    DB_COMPILED_CACHE_SIZE: int = Field(default=1000)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = Field(default=500)
+    DB_PGBOUNCER_TRANSACTION_MODE: bool = Field(default=False)
+
+    # Timeouts: server-side statement_timeout (0 disables) and the wait for
+    # a pooled connection. Both surface as 503 + Retry-After.
+    DB_STATEMENT_TIMEOUT_MS: int = Field(default=5000)
+    DB_POOL_TIMEOUT: float = Field(default=5)
+
+    # Online migrations (app.db.migrations): how long DDL may wait for its
+    # locks before backing off, and backfill batch size and pause
+    MIGRATION_LOCK_TIMEOUT_MS: int = Field(default=3000)
+    MIGRATION_LOCK_RETRIES: int = Field(default=5)
+    MIGRATION_LOCK_RETRY_DELAY: float = Field(default=1)
+    MIGRATION_BACKFILL_BATCH_SIZE: int = Field(default=10_000)
+    MIGRATION_BACKFILL_PAUSE: float = Field(default=0.1)
+
+    # Startup warm-up; connections default to the per-worker pool size
+    WARMUP_ENABLED: bool = Field(default=True)
+    WARMUP_TIMEOUT: float = Field(default=30)
+    DB_WARMUP_CONNECTIONS: Optional[int] = Field(default=None)
+
+    # Server
+    WEB_CONCURRENCY: Optional[int] = Field(default=None)
+    GRACEFUL_TIMEOUT: int = Field(default=30)
+    WORKER_TIMEOUT: int = Field(default=60)
+    WORKER_MAX_REQUESTS: int = Field(default=0)
+    WORKER_MAX_REQUESTS_JITTER: int = Field(default=0)
+
     # API
     API_V1_STR: str = Field(default="/api/v1")
     PROJECT_NAME: str = Field(default="IT Guru T3")
@@ -26,6 +64,107 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(default=30)
     REFRESH_TOKEN_EXPIRE_DAYS: int = Field(default=7)
 
+    # Login throttling (token bucket per username and per client IP)
+    LOGIN_THROTTLE_ENABLED: bool = Field(default=True)
+    LOGIN_THROTTLE_USERNAME_BURST: int = Field(default=5)
+    LOGIN_THROTTLE_USERNAME_PER_MINUTE: float = Field(default=5)
+    LOGIN_THROTTLE_IP_BURST: int = Field(default=30)
+    LOGIN_THROTTLE_IP_PER_MINUTE: float = Field(default=30)
+    LOGIN_THROTTLE_MAX_KEYS: int = Field(default=100_000)
+
+    # Password hashing
+    PASSWORD_BCRYPT_ROUNDS: int = Field(default=12, ge=4, le=31)
+    PASSWORD_HASH_WORKERS: int = Field(default=4)
+    PASSWORD_CALIBRATE_ON_STARTUP: bool = Field(default=True)
+
+    # Responses larger than this are gzip/brotli compressed
+    COMPRESSION_MIN_SIZE: int = Field(default=1024)
+
+    # Uploaded images. Files are stored under MEDIA_ROOT by content hash and
+    # served at MEDIA_URL; MEDIA_BASE_URL is prepended to stored URLs when
+    # media is fronted by another origin or a CDN.
+    MEDIA_ROOT: str = Field(default="media")
+    MEDIA_URL: str = Field(default="/media")
+    MEDIA_BASE_URL: str = Field(default="")
+    IMAGE_MAX_UPLOAD_BYTES: int = Field(default=10 * 1024 * 1024)
+    IMAGE_THUMBNAIL_SIZE: int = Field(default=320)
+    IMAGE_PROCESS_WORKERS: int = Field(default=2)
+
+    # Logging
+    LOG_LEVEL: str = Field(default="INFO")
+
+    # SQL accounting
+    SQL_SERVER_TIMING: bool = Field(default=True)
+    SLOW_QUERY_MS: Optional[float] = Field(default=None)
+    N_PLUS_ONE_THRESHOLD: int = Field(default=5)
+
+    # On-demand profiling. A request is profiled when a superuser sends it
+    # with "X-Profile: 1" (PROFILING_ON_REQUEST) or it is picked by
+    # PROFILING_SAMPLE_RATE; both are off by default.
+    PROFILING_ON_REQUEST: bool = Field(default=False)
+    PROFILING_SAMPLE_RATE: float = Field(default=0.0, ge=0, le=1)
+    PROFILING_INTERVAL: float = Field(default=0.001)
+    PROFILING_DIR: str = Field(default="profiles")
+    PROFILING_MAX_CONCURRENT: int = Field(default=2)
+    PROFILING_MAX_FILES: int = Field(default=200)
+    PROFILING_EXCLUDE_PATHS: List[str] = Field(
+        default=["/health", "/ready", "/metrics", "/api/v1/products/stream"])
+
+    # Product change feed (outbox polling and SSE delivery)
+    PRODUCT_EVENTS_ENABLED: bool = Field(default=True)
+    PRODUCT_EVENTS_POLL_INTERVAL: float = Field(default=0.5)
+    PRODUCT_EVENTS_BATCH: int = Field(default=500)
+    PRODUCT_EVENTS_GAP_TIMEOUT: float = Field(default=5)
+    PRODUCT_EVENTS_QUEUE_SIZE: int = Field(default=1000)
+    PRODUCT_EVENTS_REPLAY_LIMIT: int = Field(default=5000)
+    PRODUCT_EVENTS_RETENTION_HOURS: int = Field(default=24)
+    SSE_HEARTBEAT_INTERVAL: float = Field(default=15)
+    SSE_RETRY_MS: int = Field(default=3000)
+
+    # Catalog snapshots: gzipped JSON files rebuilt from the change feed
+    # (needs PRODUCT_EVENTS_ENABLED), debounced
+    CATALOG_SNAPSHOT_ENABLED: bool = Field(default=True)
+    CATALOG_SNAPSHOT_DIR: str = Field(default="snapshots")
+    CATALOG_SNAPSHOT_DEBOUNCE: float = Field(default=2)
+    CATALOG_SNAPSHOT_MAX_DELAY: float = Field(default=30)
+    CATALOG_SNAPSHOT_KEEP: int = Field(default=2)
+    # Superseded versions stay this many seconds longer, for workers that
+    # still advertise them
+    CATALOG_SNAPSHOT_GRACE: float = Field(default=120)
+    CATALOG_SNAPSHOT_DELTA_LIMIT: int = Field(default=5000)
+
+    # Price/stock history: buffered in memory, written in batches
+    PRICE_HISTORY_FLUSH_INTERVAL: float = Field(default=1.0)
+    PRICE_HISTORY_BATCH_SIZE: int = Field(default=500)
+    PRICE_HISTORY_MAX_BUFFER: int = Field(default=50_000)
+    PRICE_HISTORY_MAX_POINTS: int = Field(default=2000)
+
+    # Related products job (python -m app.jobs.related_products)
+    RELATED_TOP_K: int = Field(default=20)
+    RELATED_MIN_SUPPORT: int = Field(default=2)
+    RELATED_CHUNK_ROWS: int = Field(default=500_000)
+    RELATED_PRODUCT_SLICE: int = Field(default=50_000)
+    # Orders younger than this are left for the next run: ids are allocated
+    # before commit, so a recent id may still have lower ones in flight
+    RELATED_SETTLE_SECONDS: float = Field(default=60)
+
+    # Admission control. Per-route limits are keyed "METHOD /path/template"
+    # (0 = unlimited) and fall back to ADMISSION_DEFAULT_LIMIT; requests past
+    # the limit wait in a bounded queue, then get 503 + Retry-After.
+    ADMISSION_ENABLED: bool = Field(default=True)
+    ADMISSION_DEFAULT_LIMIT: int = Field(default=64)
+    ADMISSION_ROUTE_LIMITS: Dict[str, int] = Field(
+        default={"GET /api/v1/products/stream": 0})
+    ADMISSION_QUEUE_SIZE: int = Field(default=64)
+    ADMISSION_QUEUE_TIMEOUT: float = Field(default=2)
+    ADMISSION_RETRY_AFTER: int = Field(default=1)
+    # Concurrent requests per user on expensive endpoints (search)
+    USER_EXPENSIVE_CONCURRENCY: int = Field(default=2)
+
+    # Read coalescing: by-id product lookups within this window share one query
+    PRODUCT_BATCH_WINDOW_MS: float = Field(default=2)
+    PRODUCT_BATCH_MAX_SIZE: int = Field(default=100)
+
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = Field(
         default=["http://localhost:3000", "http://localhost:5173", "http://localhost:8000"])
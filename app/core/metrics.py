@@ -0,0 +1,208 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# With several uvicorn/gunicorn workers every process writes its samples to
+# PROMETHEUS_MULTIPROC_DIR and /metrics aggregates them at scrape time.
+MULTIPROCESS = bool(
+    os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    or os.environ.get("prometheus_multiproc_dir")
+)
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0
+)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code",
+    ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status code",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Connections open beyond pool_size",
+    multiprocess_mode="livesum",
+)
+DB_CONNECTION_HOLD = Histogram(
+    "db_connection_hold_seconds",
+    "Time a connection stays checked out of the pool, by route template",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    buckets=LATENCY_BUCKETS,
+)
+SQL_COMPILED_CACHE = Counter(
+    "sql_compiled_cache_total",
+    "Statements executed by SQLAlchemy compiled-cache outcome",
+    ["result"],
+)
+READS_COALESCED = Counter(
+    "reads_coalesced_total",
+    "Reads answered by joining an in-flight query or batch instead of issuing one",
+    ["kind"],
+)
+
+BCRYPT_IN_FLIGHT = Gauge(
+    "bcrypt_executor_in_flight",
+    "bcrypt operations queued or running in the hash executor",
+    multiprocess_mode="livesum",
+)
+BCRYPT_DURATION = Histogram(
+    "bcrypt_duration_seconds",
+    "bcrypt operation time including executor queueing",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Requests holding an admission slot, by route",
+    ["route"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Requests shed by overload protection, by route and reason",
+    ["route", "reason"],
+)
+
+LOGIN_THROTTLE_REJECTED = Counter(
+    "login_throttle_rejected_total",
+    "Login attempts rejected by the throttle (bcrypt verifies avoided)",
+)
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long checkouts wait for a connection."""
+
+    # Log under sqlalchemy.* like the stock pool, so echo/log levels apply
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.AsyncAdaptedQueuePool"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+
+# ASGI scope of the request being served, for attributing pool checkouts
+# (SQLAlchemy's greenlets inherit the task context)
+_request_scope: ContextVar[Optional[dict]] = ContextVar("metrics_request_scope", default=None)
+
+
+def instrument_engine(engine) -> None:
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    def update_gauges(*args):
+        pool = sync_engine.pool
+        if hasattr(pool, "checkedout"):
+            DB_POOL_CHECKED_OUT.set(pool.checkedout())
+            DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out"] = (time.perf_counter(), _request_scope.get())
+        update_gauges()
+
+    def on_checkin(dbapi_connection, connection_record):
+        update_gauges()
+        checked_out = connection_record.info.pop("checked_out", None)
+        if checked_out is None:
+            return
+        start, scope = checked_out
+        if scope is None:
+            labels = ("", "background")
+        else:
+            labels = (scope["method"], getattr(scope.get("route"), "path", "unmatched"))
+        DB_CONNECTION_HOLD.labels(*labels).observe(time.perf_counter() - start)
+
+    # Pool events registered on the engine survive engine.dispose()
+    event.listen(sync_engine, "checkout", on_checkout)
+    event.listen(sync_engine, "checkin", on_checkin)
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware task overhead) recording
+    request counts and latency per route template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_scope.reset(token)
+            HTTP_IN_FLIGHT.dec()
+            # Label by template ("/products/{product_id}"), never by raw path,
+            # to keep the number of series bounded.
+            route = scope.get("route")
+            labels = (
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code),
+            )
+            HTTP_REQUESTS.labels(*labels).inc()
+            HTTP_LATENCY.labels(*labels).observe(time.perf_counter() - start)
+
+
+def render_metrics() -> bytes:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
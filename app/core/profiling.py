@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import random
+import re
+import secrets
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from starlette.datastructures import Headers
+
+from app.auth.dependencies import superuser_from_token
+from app.core.config import settings
+from app.core.sql_stats import current_stats
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # optional: profiling is unavailable without it
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+# Also rules out path traversal when serving files by id
+PROFILE_ID = re.compile(r"^\d{13}-[0-9a-f]{8}$")
+# Statements listed per profile, by total time
+TOP_STATEMENTS = 20
+
+
+def profile_dir() -> Path:
+    return Path(settings.PROFILING_DIR)
+
+
+def collapsed_stacks(root) -> List[str]:
+    """
+    pyinstrument frame tree as collapsed stacks ("a;b;c <microseconds>"),
+    the input format of flamegraph.pl, speedscope and inferno.
+    """
+    lines = []
+
+    def name(frame) -> str:
+        if frame.is_synthetic:
+            label = frame.identifier  # [await], [self], ...
+        else:
+            label = f"{frame.function} ({frame.file_path_short}:{frame.line_no})"
+        return label.replace(";", ":")
+
+    def walk(frame, prefix: str) -> None:
+        path = f"{prefix};{name(frame)}" if prefix else name(frame)
+        children = frame.children
+        own = round((frame.time - sum(child.time for child in children)) * 1e6)
+        if own > 0:
+            lines.append(f"{path} {own}")
+        for child in children:
+            walk(child, path)
+
+    if root is not None:
+        walk(root, "")
+    return lines
+
+
+def _write_profile(profile_id: str, session, meta: dict) -> None:
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    # pyinstrument --load=<id>.pyisession renders it again (html, text, ...)
+    session.save(str(directory / f"{profile_id}.pyisession"))
+    (directory / f"{profile_id}.collapsed").write_text(
+        "\n".join(collapsed_stacks(session.root_frame())) + "\n"
+    )
+    # Metadata last: listing only picks up complete profiles
+    (directory / f"{profile_id}.json").write_text(json.dumps(meta))
+    _prune(directory)
+
+
+def _prune(directory: Path) -> None:
+    metas = sorted(directory.glob("*.json"), key=lambda path: path.name, reverse=True)
+    for meta in metas[settings.PROFILING_MAX_FILES:]:
+        for suffix in (".json", ".collapsed", ".pyisession"):
+            meta.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def list_profiles(limit: int) -> List[dict]:
+    """Metadata of the most recent profiles, newest first."""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    # Ids start with a millisecond timestamp, so names sort by age
+    paths = sorted(directory.glob("*.json"), key=lambda path: path.name, reverse=True)
+    profiles = []
+    for path in paths[:limit]:
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue  # pruned or being written meanwhile
+    return profiles
+
+
+class ProfilingMiddleware:
+    """
+    Runs selected requests under pyinstrument's sampling profiler and
+    stores the result in PROFILING_DIR as collapsed stacks and a pyinstrument
+    session, next to metadata with the request's SQL statements and their
+    timings. The profile id is returned in an X-Profile-Id header.
+
+    The profiler follows the request's async context, so time the request
+    spends awaiting (the database, a lock) shows up as [await] instead of
+    as other requests' work. At most PROFILING_MAX_CONCURRENT requests per
+    worker are profiled at once; others run unprofiled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+        if Profiler is None and (settings.PROFILING_ON_REQUEST or settings.PROFILING_SAMPLE_RATE):
+            logger.warning("Profiling is configured but pyinstrument is not installed")
+
+    async def _reason(self, scope) -> Optional[str]:
+        if Profiler is None or self.in_flight >= settings.PROFILING_MAX_CONCURRENT:
+            return None
+        if any(scope["path"].startswith(path) for path in settings.PROFILING_EXCLUDE_PATHS):
+            return None
+        headers = Headers(scope=scope)
+        if settings.PROFILING_ON_REQUEST and headers.get(PROFILE_HEADER):
+            # Profiles expose SQL and code paths: superusers only. The
+            # header alone from anyone else is ignored, not an error.
+            scheme, _, token = headers.get("authorization", "").partition(" ")
+            if scheme.lower() == "bearer" and await superuser_from_token(token):
+                return "header"
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        reason = await self._reason(scope) if scope["type"] == "http" else None
+        # Checked again: others may have started while the user was looked up
+        if reason is None or self.in_flight >= settings.PROFILING_MAX_CONCURRENT:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{int(time.time() * 1000)}-{secrets.token_hex(4)}"
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-profile-id", profile_id.encode()),
+                ]
+            await send(message)
+
+        self.in_flight += 1
+        profiler = Profiler(interval=settings.PROFILING_INTERVAL, async_mode="enabled")
+        started_at = time.time()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session = profiler.stop()
+            self.in_flight -= 1
+            stats = current_stats()
+            route = getattr(scope.get("route"), "path", None)
+            meta = {
+                "id": profile_id,
+                "reason": reason,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route,
+                "status": status,
+                "started_at": started_at,
+                "duration_ms": round(session.duration * 1000, 2),
+                "sql": None if stats is None else {
+                    "count": stats.count,
+                    "time_ms": round(stats.db_time * 1000, 2),
+                    "statements": [
+                        {
+                            "statement": statement,
+                            "count": stats.statements[statement],
+                            "time_ms": round(elapsed * 1000, 2),
+                        }
+                        for statement, elapsed in stats.statement_time.most_common(TOP_STATEMENTS)
+                    ],
+                },
+            }
+            try:
+                await asyncio.to_thread(_write_profile, profile_id, session, meta)
+            except OSError:
+                logger.exception("Could not write profile %s", profile_id)
@@ -0,0 +1,179 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import SQL_COMPILED_CACHE
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SQLStats:
+    count: int = 0
+    db_time: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    statement_time: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.db_time += elapsed
+        self.statements[statement] += 1
+        self.statement_time[statement] += elapsed
+
+
+# Stats of the request being served. SQLAlchemy's greenlets inherit the
+# task context, so the engine events below see the value set by the
+# middleware.
+_request_stats: ContextVar[Optional[SQLStats]] = ContextVar(
+    "sql_request_stats", default=None
+)
+# Extra collectors installed by count_queries(), e.g. from budget checks.
+# A context variable too, so statements of background tasks (warm-up,
+# outbox polling, history flushes) running meanwhile are not counted.
+_collectors: ContextVar[Tuple[SQLStats, ...]] = ContextVar(
+    "sql_collectors", default=()
+)
+
+
+def current_stats() -> Optional[SQLStats]:
+    return _request_stats.get()
+
+
+def params_shape(parameters: Any) -> Any:
+    """Describe bound parameters by type only, never by value."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany
+            return f"{len(parameters)} x {params_shape(parameters[0])}"
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    for collector in _collectors.get():
+        collector.record(statement, elapsed)
+
+    cache_hit = getattr(context, "cache_hit", None)
+    if cache_hit is not None:
+        SQL_COMPILED_CACHE.labels(result=cache_hit.name.lower()).inc()
+
+    if (
+        settings.SLOW_QUERY_MS is not None
+        and elapsed * 1000 >= settings.SLOW_QUERY_MS
+    ):
+        logger.warning(
+            "Slow query (%.1f ms): %s params=%s",
+            elapsed * 1000,
+            statement,
+            params_shape(parameters),
+        )
+
+
+def install_sql_stats(engine) -> None:
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SQLStatsMiddleware:
+    """
+    Counts statements and DB time per request, reports them in a
+    Server-Timing header and warns about statements repeated often enough
+    to look like an N+1 pattern.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = SQLStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and settings.SQL_SERVER_TIMING:
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.db_time * 1000:.2f};desc="{stats.count} queries"'.encode(),
+                ))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            self._check_repeats(scope, stats)
+
+    @staticmethod
+    def _check_repeats(scope, stats: SQLStats) -> None:
+        threshold = settings.N_PLUS_ONE_THRESHOLD
+        if not threshold:
+            return
+        for statement, count in stats.statements.items():
+            if count >= threshold:
+                route = getattr(scope.get("route"), "path", scope["path"])
+                logger.warning(
+                    "Possible N+1 on %s %s: statement ran %d times: %s",
+                    scope["method"],
+                    route,
+                    count,
+                    statement,
+                )
+
+
+@contextmanager
+def count_queries():
+    """
+    Collect the statements executed inside the block by this task and the
+    tasks it starts, on any engine.
+    """
+    stats = SQLStats()
+    token = _collectors.set(_collectors.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _collectors.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = ""):
+    """
+    Fail with AssertionError if the block runs more than max_queries statements.
+
+    Usage:
+        with query_budget(2, "GET /products"):
+            await client.get("/api/v1/products/")
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        statements = "\n".join(
+            f"  {count} x {statement}" for statement, count in stats.statements.items()
+        )
+        raise AssertionError(
+            f"{label or 'block'} ran {stats.count} queries, budget is {max_queries}:\n"
+            f"{statements}"
+        )
@@ -0,0 +1,228 @@
+# app/db/migrations.py
+"""
+Helpers for migrations that must not block a busy database.
+
+Plain ``op.create_index`` holds a lock that blocks writes to the table for
+the whole build, and any DDL queued behind a long transaction blocks every
+query that arrives after it. Use these instead in alembic/versions/:
+
+- create_index_concurrently / drop_index_concurrently: CREATE/DROP INDEX
+  CONCURRENTLY, which must run outside a transaction. Left-over invalid
+  indexes from an interrupted build are dropped and rebuilt.
+- with_lock_retry: run short DDL (add_column, constraints) with a
+  lock_timeout, retrying with backoff instead of queueing indefinitely.
+- backfill: UPDATE a large table in primary key batches, each committed
+  on its own, with a pause between batches and progress logging. Batches
+  only touch rows matching ``where``, so an interrupted backfill resumes
+  where it stopped when the migration is run again.
+
+Adding a column then looks like::
+
+    with_lock_retry(lambda: op.add_column('products', sa.Column('slug', sa.String(255))))
+    backfill('products', "slug = lower(article)", where="slug IS NULL")
+    create_index_concurrently('ix_products_slug', 'products', ['slug'])
+
+Offline (``alembic upgrade --sql``) the helpers emit the equivalent plain
+statements.
+"""
+import logging
+import time
+from typing import Callable, Optional, Sequence
+
+from alembic import op
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def _sqlstate(exc: DBAPIError) -> Optional[str]:
+    # psycopg 3 / psycopg2
+    return getattr(exc.orig, "sqlstate", None) or getattr(exc.orig, "pgcode", None)
+
+
+def _offline() -> bool:
+    return op.get_context().as_sql
+
+
+def _retry(action: Callable[[], None], what: str, on_timeout: Callable[[], None] = None) -> None:
+    attempts = settings.MIGRATION_LOCK_RETRIES
+    for attempt in range(1, attempts + 1):
+        try:
+            action()
+            return
+        except DBAPIError as exc:
+            if _sqlstate(exc) != LOCK_NOT_AVAILABLE or attempt == attempts:
+                raise
+            delay = settings.MIGRATION_LOCK_RETRY_DELAY * 2 ** (attempt - 1)
+            logger.warning(
+                "%s: lock not granted within %d ms (attempt %d/%d), retrying in %.1f s",
+                what, settings.MIGRATION_LOCK_TIMEOUT_MS, attempt, attempts, delay,
+            )
+            if on_timeout is not None:
+                on_timeout()
+            time.sleep(delay)
+
+
+def with_lock_retry(action: Callable[[], None], what: str = "DDL") -> None:
+    """
+    Run `action` (alembic ops) in a savepoint with lock_timeout set,
+    retrying when it cannot get its locks in time. Waiting in the lock
+    queue would block all other queries on the table meanwhile.
+
+    SET LOCAL outlives a released savepoint, so the previous lock_timeout
+    is restored afterwards; later steps of the migration keep theirs.
+    """
+    if _offline():
+        op.execute(f"SET LOCAL lock_timeout = '{settings.MIGRATION_LOCK_TIMEOUT_MS}ms'")
+        action()
+        op.execute("SET LOCAL lock_timeout TO DEFAULT")
+        return
+    bind = op.get_bind()
+    previous = bind.execute(text("SELECT current_setting('lock_timeout')")).scalar()
+
+    def attempt():
+        with bind.begin_nested():
+            bind.execute(text(f"SET LOCAL lock_timeout = '{settings.MIGRATION_LOCK_TIMEOUT_MS}ms'"))
+            action()
+
+    try:
+        _retry(attempt, what)
+    finally:
+        bind.execute(
+            text("SELECT set_config('lock_timeout', :value, true)"), {"value": previous}
+        )
+
+
+def _session_timeouts() -> None:
+    # Session level: in an autocommit block there is no transaction for
+    # SET LOCAL. The build itself may take long, so no statement_timeout.
+    op.execute(f"SET lock_timeout = '{settings.MIGRATION_LOCK_TIMEOUT_MS}ms'")
+    op.execute("SET statement_timeout = 0")
+
+
+def _reset_timeouts() -> None:
+    op.execute("RESET lock_timeout")
+    op.execute("RESET statement_timeout")
+
+
+def _index_is_invalid(name: str) -> bool:
+    result = op.get_bind().execute(
+        text(
+            "SELECT NOT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND c.relnamespace = current_schema()::regnamespace"
+        ),
+        {"name": name},
+    )
+    return bool(result.scalar())
+
+
+def create_index_concurrently(name: str, table: str, columns: Sequence, **kw) -> None:
+    """op.create_index without blocking writes; accepts the same keywords."""
+    with op.get_context().autocommit_block():
+        if _offline():
+            op.create_index(name, table, columns, postgresql_concurrently=True, **kw)
+            return
+        _session_timeouts()
+        try:
+            if _index_is_invalid(name):
+                # Interrupted earlier build; IF NOT EXISTS would keep it
+                logger.info("Dropping invalid index %s", name)
+                op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+            def drop_partial():
+                op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+            started = time.perf_counter()
+            _retry(
+                lambda: op.create_index(
+                    name, table, columns,
+                    postgresql_concurrently=True, if_not_exists=True, **kw
+                ),
+                f"CREATE INDEX {name}",
+                on_timeout=drop_partial,
+            )
+            logger.info("Built index %s in %.1f s", name, time.perf_counter() - started)
+        finally:
+            _reset_timeouts()
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    with op.get_context().autocommit_block():
+        if _offline():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+            return
+        _session_timeouts()
+        try:
+            _retry(
+                lambda: op.drop_index(
+                    name, table_name=table, postgresql_concurrently=True, if_exists=True
+                ),
+                f"DROP INDEX {name}",
+            )
+        finally:
+            _reset_timeouts()
+
+
+def backfill(
+    table: str,
+    set_: str,
+    where: str,
+    key: str = "id",
+    batch_size: Optional[int] = None,
+    pause: Optional[float] = None,
+) -> int:
+    """
+    ``UPDATE table SET <set_> WHERE <where>`` in batches of `batch_size`
+    consecutive keys, committing each batch and sleeping `pause` seconds
+    in between, so locks stay short and replicas and autovacuum keep up.
+    `where` must exclude rows that are already done, which makes the
+    backfill resumable. Returns the number of rows updated.
+    """
+    batch_size = batch_size or settings.MIGRATION_BACKFILL_BATCH_SIZE
+    pause = settings.MIGRATION_BACKFILL_PAUSE if pause is None else pause
+    if _offline():
+        op.execute(f"UPDATE {table} SET {set_} WHERE {where}")
+        return 0
+
+    updated = 0
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        _session_timeouts()
+        try:
+            low, high = bind.execute(
+                text(f"SELECT min({key}), max({key}) FROM {table} WHERE {where}")
+            ).one()
+            if low is None:
+                logger.info("Backfill %s: nothing to do", table)
+                return 0
+            statement = text(
+                f"UPDATE {table} SET {set_} "
+                f"WHERE {key} >= :low AND {key} < :high AND ({where})"
+            )
+            started = time.perf_counter()
+            for start in range(low, high + 1, batch_size):
+                result = None
+
+                def run_batch():
+                    nonlocal result
+                    result = bind.execute(statement, {"low": start, "high": start + batch_size})
+
+                _retry(run_batch, f"Backfill {table}")
+                updated += result.rowcount
+                done = min(start + batch_size, high + 1) - low
+                logger.info(
+                    "Backfill %s: %.1f%% of %s range, %d rows, %.0f rows/s",
+                    table, 100 * done / (high + 1 - low), key, updated,
+                    updated / max(time.perf_counter() - started, 1e-9),
+                )
+                if pause:
+                    time.sleep(pause)
+        finally:
+            _reset_timeouts()
+    return updated
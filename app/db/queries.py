@@ -0,0 +1,245 @@
+# app/db/queries.py
+"""
+Hot queries as lambda statements.
+
+A lambda statement caches its construction and compilation keyed on the
+lambda's code location, so repeated calls skip rebuilding the select() and
+computing its cache key; only the bound values change. Variants (search on
+or off, sort column and direction) get their own cache entry, which keeps
+the number of shapes small and fixed.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Integer, String, asc, delete, desc, func, insert, lambda_stmt, literal, or_, select, true, update
+from sqlalchemy.sql import StatementLambdaElement
+
+from app.models.product import Order, Product, ProductRelated
+from app.models.user import User
+
+
+# Sortable product fields; each has an index on (column, id), see
+# migration e5a1c7b9d3f4.
+SORTABLE_FIELDS = {
+    "id": Product.id,
+    "name": Product.name,
+    "vendor": Product.vendor,
+    "article": Product.article,
+    "price": Product.price,
+    "rating": Product.rating,
+    "created_at": Product.created_at,
+}
+
+
+@dataclass(frozen=True)
+class ProductFilters:
+    """
+    Structured list filters. Each one is a plain comparison on a column
+    (no functions or casts), so it can use the composite and partial
+    indexes from migration f6b2d8c4e0a7. Hashable, for coalescing keys.
+    """
+    category: Optional[str] = None
+    vendors: Tuple[str, ...] = ()
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    rating_min: Optional[float] = None
+    in_stock: Optional[bool] = None
+
+
+def user_by_id(user_id: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(User).where(User.id == user_id))
+
+
+def product_by_id(product_id: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(Product).where(Product.id == product_id))
+
+
+def product_list(
+    skip: int,
+    limit: int,
+    search: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc",
+    filters: Optional[ProductFilters] = None,
+) -> StatementLambdaElement:
+    stmt = lambda_stmt(lambda: select(Product))
+
+    # Every filter that is set appends its own lambda, so each combination
+    # is a separate cached variant with only the values bound.
+    if filters is not None:
+        category = filters.category
+        vendors = list(filters.vendors)
+        price_min = filters.price_min
+        price_max = filters.price_max
+        rating_min = filters.rating_min
+        if category is not None:
+            stmt += lambda s: s.where(Product.category == category)
+        if vendors:
+            stmt += lambda s: s.where(Product.vendor.in_(vendors))
+        if price_min is not None:
+            stmt += lambda s: s.where(Product.price >= price_min)
+        if price_max is not None:
+            stmt += lambda s: s.where(Product.price <= price_max)
+        if rating_min is not None:
+            stmt += lambda s: s.where(Product.rating >= rating_min)
+        if filters.in_stock is True:
+            stmt += lambda s: s.where(Product.quantity > 0)
+        elif filters.in_stock is False:
+            stmt += lambda s: s.where(Product.quantity <= 0)
+
+    if search:
+        pattern = f"%{search}%"
+        stmt += lambda s: s.where(
+            or_(
+                Product.name.ilike(pattern),
+                Product.vendor.ilike(pattern),
+                Product.article.ilike(pattern),
+                Product.category.ilike(pattern)
+            )
+        )
+
+    # Order by (column, id) so pages are stable on duplicate values and the
+    # matching (column, id) index can serve the order without a sort.
+    column = SORTABLE_FIELDS[sort_by or "id"]
+    direction = desc if sort_order == "desc" else asc
+    order_by = [direction(column)]
+    if column is not Product.id:
+        order_by.append(direction(Product.id))
+    # The columns and direction are not bound values, so key the cached
+    # variant on them explicitly.
+    stmt = stmt.add_criteria(
+        lambda s: s.order_by(*order_by),
+        track_on=[sort_by, sort_order],
+    )
+
+    stmt += lambda s: s.offset(skip).limit(limit)
+    return stmt
+
+
+def products_by_ids(product_ids: List[int]) -> StatementLambdaElement:
+    # The list becomes one expanding IN parameter, so any number of ids
+    # shares a single cache entry.
+    return lambda_stmt(lambda: select(Product).where(Product.id.in_(product_ids)))
+
+
+def related_products(product_id: int, limit: int):
+    """
+    The stored neighbours of product_id joined to products, best first, in
+    one statement: a primary key read of product_related plus PK lookups.
+    """
+    related = func.unnest(ProductRelated.related_ids).table_valued(
+        "id", with_ordinality="position"
+    ).render_derived()
+    return (
+        select(Product)
+        .select_from(ProductRelated)
+        .join(related, true())
+        .join(Product, Product.id == related.c.id)
+        .where(ProductRelated.product_id == product_id)
+        .order_by(related.c.position)
+        .limit(limit)
+    )
+
+
+# Writes. Built per call, since the set of updated columns varies; each
+# is a single statement that returns what the endpoint responds with.
+
+def insert_product(values: dict):
+    return insert(Product).values(**values).returning(Product)
+
+
+def update_product(product_id: int, values: dict):
+    """
+    UPDATE ... RETURNING the new row plus the previous price and quantity
+    (read from the locked row in the same statement), for price history.
+    """
+    old = (
+        select(Product.id, Product.price, Product.quantity)
+        .where(Product.id == product_id)
+        .with_for_update()
+        .subquery("old")
+    )
+    return (
+        update(Product)
+        .where(Product.id == old.c.id)
+        .values(**values)
+        .returning(
+            *Product.__table__.c,
+            old.c.price.label("previous_price"),
+            old.c.quantity.label("previous_quantity"),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def set_product_image(product_id: int, image_url: str):
+    """New image; its thumbnail is set later by set_product_thumbnail."""
+    return (
+        update(Product)
+        .where(Product.id == product_id)
+        .values(image_url=image_url, thumbnail_url=None)
+        .returning(*Product.__table__.c)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def set_product_thumbnail(product_id: int, image_url: str, thumbnail_url: str):
+    """Only if the product still has the image the thumbnail was made from."""
+    return (
+        update(Product)
+        .where(Product.id == product_id, Product.image_url == image_url)
+        .values(thumbnail_url=thumbnail_url)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_product(product_id: int):
+    return (
+        delete(Product)
+        .where(Product.id == product_id)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def place_order(product_id: int, user_id: int, quantity: int):
+    """
+    Take `quantity` from stock and insert the order in one statement. The
+    stock check is part of the UPDATE, so concurrent orders can't oversell;
+    no row comes back if the product is missing or short of stock.
+    """
+    taken = (
+        update(Product)
+        .where(Product.id == product_id, Product.quantity >= quantity)
+        .values(quantity=Product.quantity - quantity)
+        .returning(
+            Product.id, Product.name, Product.vendor, Product.article,
+            Product.price, Product.quantity,
+        )
+        .cte("taken")
+    )
+    quantity_param = literal(quantity, Integer)
+    return (
+        insert(Order.__table__)
+        .from_select(
+            [
+                "product_id", "user_id", "product_name", "vendor", "article",
+                "quantity", "price", "total_amount", "status",
+            ],
+            select(
+                taken.c.id,
+                literal(user_id, Integer),
+                taken.c.name,
+                taken.c.vendor,
+                taken.c.article,
+                quantity_param,
+                taken.c.price,
+                taken.c.price * quantity_param,
+                literal("pending", String),
+            ),
+        )
+        .returning(
+            *Order.__table__.c,
+            select(taken.c.quantity).scalar_subquery().label("product_quantity"),
+        )
+    )
@@ -1,31 +1,187 @@
 # app/db/session.py
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import declarative_base
-from app.core.config import settings
+import uuid
+from typing import Optional, Tuple
 
-# Create async engine with asyncpg
-engine = create_async_engine(
-    settings.DATABASE_URL,  # Must be: postgresql+asyncpg://...
-    pool_pre_ping=True,
-    echo=False,
-    future=True,
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
 )
+from app.core.config import settings
+from app.core.metrics import InstrumentedAsyncPool, instrument_engine
+from app.core.sql_stats import install_sql_stats
+
+# The engine is created in the application lifespan (init_engine), not at
+# import time, so importing the app never opens sockets or reads secrets.
+engine: Optional[AsyncEngine] = None
+
+
+class RequestSession(AsyncSession):
+    """
+    Session for request handlers that can give its pooled connection back
+    before a long wait.
+
+    Like any session it checks a connection out on the first statement and
+    keeps it for the transaction. release() ends the transaction early if
+    it has only read, which returns the connection to the pool. Objects
+    loaded so far stay usable (expire_on_commit=False), and a later
+    statement checks a connection out again. Once the transaction writes
+    (DML, SELECT ... FOR UPDATE, raw SQL, or pending ORM changes),
+    release() leaves it alone until commit or rollback.
+
+    Handlers call it before waiting on something other than this session:
+    bcrypt, an upload, or reads on their own sessions. Releasing right
+    before the session is done anyway costs nothing, since its COMMIT
+    replaces the ROLLBACK that closing would send. Releasing between
+    statements would cost a checkout, pre-ping and BEGIN each time.
+    """
+
+    _writing = False
+
+    @staticmethod
+    def _is_plain_select(statement) -> bool:
+        # Lambda statements resolve to the statement they build
+        statement = getattr(statement, "_resolved", statement)
+        return bool(getattr(statement, "is_select", False)) and getattr(
+            statement, "_for_update_arg", None
+        ) is None
 
-# Create async session factory
+    async def execute(self, statement, *args, **kwargs):
+        if not self._is_plain_select(statement):
+            self._writing = True
+        return await super().execute(statement, *args, **kwargs)
+
+    async def flush(self, objects=None):
+        if self.new or self.dirty or self.deleted:
+            self._writing = True
+        await super().flush(objects)
+
+    async def release(self) -> None:
+        """Return the connection to the pool if the transaction has only read."""
+        if (
+            self.in_transaction()
+            and not self._writing
+            and not (self.new or self.dirty or self.deleted)
+        ):
+            await self.commit()
+
+    async def commit(self):
+        await super().commit()
+        self._writing = False
+
+    async def rollback(self):
+        await super().rollback()
+        self._writing = False
+
+
+# Bound to the engine by init_engine()
 AsyncSessionLocal = async_sessionmaker(
-    engine,
     class_=AsyncSession,
     expire_on_commit=False,
     autocommit=False,
     autoflush=False
 )
+# Sessions of get_async_db
+RequestSessionLocal = async_sessionmaker(
+    class_=RequestSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False
+)
+
+
+# query_canceled, which is what statement_timeout raises
+STATEMENT_TIMEOUT_SQLSTATE = "57014"
+
+
+class StatementTimeoutError(OperationalError):
+    """A statement cancelled by statement_timeout."""
+
+
+def install_statement_timeout_errors(engine: AsyncEngine) -> None:
+    """
+    Raise StatementTimeoutError for statement timeouts. asyncpg errors
+    otherwise all map to the generic DBAPIError, so a handler for them
+    could only pick timeouts out of every other database error.
+    """
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def translate(context):
+        if getattr(context.original_exception, "sqlstate", None) == STATEMENT_TIMEOUT_SQLSTATE:
+            return StatementTimeoutError(
+                context.statement, context.parameters, context.original_exception
+            )
+
+
+def pool_limits(workers: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Per-worker (pool_size, max_overflow), clamped so that all workers
+    together stay within DB_CONNECTION_BUDGET. `workers` defaults to
+    WEB_CONCURRENCY.
+    """
+    workers = max(1, workers or settings.WEB_CONCURRENCY or 1)
+    per_worker = max(1, settings.DB_CONNECTION_BUDGET // workers)
+    pool_size = max(1, min(settings.DB_POOL_SIZE, per_worker))
+    max_overflow = max(0, min(settings.DB_MAX_OVERFLOW, per_worker - pool_size))
+    return pool_size, max_overflow
+
+
+def connect_args() -> dict:
+    if settings.DB_PGBOUNCER_TRANSACTION_MODE:
+        # No statement cache, and unique names for the unnamed statements
+        # asyncpg still prepares, since consecutive transactions may land on
+        # different server connections.
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    args = {"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        # Sent as a startup parameter. PgBouncer rejects those unless listed
+        # in ignore_startup_parameters, so behind it set statement_timeout on
+        # the database role instead.
+        args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+    return args
+
+
+def init_engine() -> AsyncEngine:
+    global engine
+    if engine is None:
+        pool_size, max_overflow = pool_limits()
+        engine = create_async_engine(
+            settings.DATABASE_URL,  # Must be: postgresql+asyncpg://...
+            pool_pre_ping=True,
+            echo=False,
+            poolclass=InstrumentedAsyncPool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            query_cache_size=settings.DB_COMPILED_CACHE_SIZE,
+            connect_args=connect_args(),
+        )
+        instrument_engine(engine)
+        install_sql_stats(engine)
+        install_statement_timeout_errors(engine)
+        AsyncSessionLocal.configure(bind=engine)
+        RequestSessionLocal.configure(bind=engine)
+    return engine
+
+
+async def dispose_engine() -> None:
+    global engine
+    if engine is not None:
+        await engine.dispose()
+        engine = None
 
-Base = declarative_base()
 
-# Async dependency
+# Async dependency. Creating the session costs no connection; see
+# RequestSession for releasing one early.
 async def get_async_db():
-    async with AsyncSessionLocal() as session:
+    async with RequestSessionLocal() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
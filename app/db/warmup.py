@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List
+
+from app.core.config import settings
+from app.db import queries
+from app.db import session as db_session
+
+logger = logging.getLogger(__name__)
+
+WarmupHook = Callable[[], Awaitable[None]]
+
+# Extra steps (e.g. filling in-process caches) run after the pool is warm
+_hooks: List[WarmupHook] = []
+_ready = asyncio.Event()
+
+
+def register_warmup(hook: WarmupHook) -> WarmupHook:
+    _hooks.append(hook)
+    return hook
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def hot_statements() -> list:
+    # The lookups behind get_current_user, GET /products/ and
+    # GET /products/{id} and /batch; the ids do not need to exist to prime
+    # the caches.
+    return [
+        queries.user_by_id(0),
+        queries.product_list(0, 100),
+        queries.product_by_id(0),
+        queries.products_by_ids([0]),
+    ]
+
+
+async def _warm_connection() -> None:
+    # Every session holds its own connection until closed, so running these
+    # concurrently opens that many pool connections and primes the
+    # per-connection prepared statement cache on each of them.
+    async with db_session.AsyncSessionLocal() as session:
+        for stmt in hot_statements():
+            await session.execute(stmt)
+
+
+async def warm_up() -> None:
+    start = time.perf_counter()
+    connections = settings.DB_WARMUP_CONNECTIONS
+    if connections is None:
+        connections = db_session.pool_limits()[0]
+
+    await asyncio.gather(*(_warm_connection() for _ in range(max(1, connections))))
+    for hook in _hooks:
+        await hook()
+
+    logger.info(
+        "Warm-up done in %.0f ms (%d connections, %d hooks)",
+        (time.perf_counter() - start) * 1000,
+        connections,
+        len(_hooks),
+    )
+
+
+async def run_warmup() -> None:
+    """Warm up until it succeeds, then mark the process ready."""
+    _ready.clear()
+    if not settings.WARMUP_ENABLED:
+        _ready.set()
+        return
+
+    delay = 1.0
+    while True:
+        try:
+            await asyncio.wait_for(warm_up(), timeout=settings.WARMUP_TIMEOUT)
+            break
+        except Exception:
+            logger.exception("Warm-up failed, retrying in %.0f s", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+    _ready.set()
@@ -0,0 +1,278 @@
+# app/jobs/related_products.py
+"""
+"Frequently bought together" recommendations from the orders table.
+
+Builds the product co-occurrence matrix C = Bᵀ·B, where B is the binary
+user × product purchase matrix, keeps the top RELATED_TOP_K neighbours of
+every product by cosine similarity C[p, q] / sqrt(n_p · n_q), and stores
+them in product_related (one row per product).
+
+    pip install -r requirements-jobs.txt          # numpy and scipy
+    python -m app.jobs.related_products           # incremental
+    python -m app.jobs.related_products --full    # rebuild everything
+
+Orders are streamed ordered by user and cut into chunks on user
+boundaries, so each chunk's Bᵀ·B is exact for its users and the chunks
+simply add up. Memory is bounded by the chunk size and by the rows of C
+being computed (products are processed in slices).
+
+Incremental runs read orders after the stored watermark and recompute
+only the rows that can have changed, from the complete histories of the
+users who bought those products: products bought by users with new orders
+(their co-occurrence counts changed), and products that list a newly
+bought product among their neighbours (its popularity n_q, and with it
+the score, changed, which can also let another neighbour into the top K).
+A run only goes up to orders older than RELATED_SETTLE_SECONDS: order ids
+are allocated before commit, and an order committed after a higher id was
+read would fall below the watermark and never be counted. Deleted orders
+are only accounted for by --full.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import Integer, any_, delete, exists, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+
+from app.core.config import settings
+from app.db import session as db_session
+from app.models.job import JobWatermark
+from app.models.product import Order, ProductRelated
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "related_products"
+
+
+def _id_array(ids: np.ndarray):
+    # One array parameter instead of an IN list, which would run into the
+    # 32767 bind parameter limit on large slices
+    return any_(literal(ids.tolist(), ARRAY(Integer)))
+
+
+async def _stream_pairs(session, high: int, products: Optional[np.ndarray]) -> AsyncIterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Yield (user_ids, product_ids) chunks ordered by user, never splitting a
+    user across chunks. With `products`, only users who bought one of them.
+    """
+    stmt = (
+        select(Order.user_id, Order.product_id)
+        .where(Order.user_id.is_not(None), Order.id <= high)
+        .order_by(Order.user_id)
+    )
+    if products is not None:
+        buyers = (
+            select(Order.user_id)
+            .where(Order.product_id == _id_array(products), Order.id <= high)
+            .distinct()
+        )
+        stmt = stmt.where(Order.user_id.in_(buyers))
+
+    result = await session.stream(stmt.execution_options(yield_per=settings.RELATED_CHUNK_ROWS))
+    carry_users = np.empty(0, dtype=np.int64)
+    carry_products = np.empty(0, dtype=np.int64)
+    async for rows in result.partitions():
+        block = np.asarray(rows, dtype=np.int64).reshape(-1, 2)
+        users = np.concatenate([carry_users, block[:, 0]])
+        products_ = np.concatenate([carry_products, block[:, 1]])
+        # Hold back the last user, whose orders may continue in the next block
+        cut = np.searchsorted(users, users[-1], side="left")
+        carry_users, carry_products = users[cut:], products_[cut:]
+        if cut:
+            yield users[:cut], products_[:cut]
+    if len(carry_users):
+        yield carry_users, carry_products
+
+
+def _purchase_matrix(users: np.ndarray, products: np.ndarray, n_products: int) -> sparse.csr_matrix:
+    rows = np.unique(users, return_inverse=True)[1]
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, products)),
+        shape=(rows.max() + 1, n_products),
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1  # bought at all, not how often
+    return matrix
+
+
+async def _cooccurrence(session, high: int, rows: np.ndarray, n_products: int, restrict: bool) -> sparse.csr_matrix:
+    """C[rows, :] accumulated chunk by chunk."""
+    result = sparse.csr_matrix((len(rows), n_products), dtype=np.float32)
+    async for users, products in _stream_pairs(session, high, rows if restrict else None):
+        purchases = _purchase_matrix(users, products, n_products)
+        result = result + (purchases.tocsc()[:, rows].T.tocsr() @ purchases)
+    return result.tocsr()
+
+
+async def _popularity(session, high: int, product_ids: np.ndarray) -> Dict[int, int]:
+    """Distinct buyers per product."""
+    result = await session.execute(
+        select(Order.product_id, func.count(func.distinct(Order.user_id)))
+        .where(
+            Order.product_id == _id_array(product_ids),
+            Order.user_id.is_not(None),
+            Order.id <= high,
+        )
+        .group_by(Order.product_id)
+    )
+    return dict(result.all())
+
+
+def _top_k(cooc: sparse.csr_matrix, rows: np.ndarray, popularity: Dict[int, int]) -> List[dict]:
+    records = []
+    for i, product_id in enumerate(rows.tolist()):
+        start, end = cooc.indptr[i], cooc.indptr[i + 1]
+        neighbours = cooc.indices[start:end]
+        counts = cooc.data[start:end]
+        keep = (neighbours != product_id) & (counts >= settings.RELATED_MIN_SUPPORT)
+        neighbours, counts = neighbours[keep], counts[keep]
+        if not len(neighbours):
+            records.append({"product_id": product_id, "related_ids": [], "scores": []})
+            continue
+        n_p = popularity.get(product_id, 1)
+        n_q = np.array([popularity.get(q, 1) for q in neighbours.tolist()], dtype=np.float32)
+        scores = counts / np.sqrt(n_p * n_q)
+        k = min(settings.RELATED_TOP_K, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        records.append({
+            "product_id": product_id,
+            "related_ids": neighbours[best].tolist(),
+            "scores": [round(float(score), 4) for score in scores[best]],
+        })
+    return records
+
+
+async def _store(session, records: List[dict]) -> None:
+    empty = [record["product_id"] for record in records if not record["related_ids"]]
+    rows = [record for record in records if record["related_ids"]]
+    if empty:
+        await session.execute(
+            delete(ProductRelated).where(ProductRelated.product_id == _id_array(np.array(empty)))
+        )
+    for start in range(0, len(rows), 1000):
+        stmt = insert(ProductRelated).values(rows[start:start + 1000])
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=[ProductRelated.product_id],
+            set_={
+                "related_ids": stmt.excluded.related_ids,
+                "scores": stmt.excluded.scores,
+                "updated_at": func.now(),
+            },
+        ))
+    await session.commit()
+
+
+async def _affected_products(session, watermark: int, high: int) -> np.ndarray:
+    """
+    Everything bought by users who have orders after the watermark, plus
+    the products whose stored neighbours include a newly bought product.
+    """
+    new_orders = (Order.id > watermark, Order.id <= high, Order.user_id.is_not(None))
+    new_buyers = select(Order.user_id).where(*new_orders).distinct()
+    result = await session.execute(
+        select(Order.product_id)
+        .where(Order.user_id.in_(new_buyers), Order.id <= high)
+        .distinct()
+    )
+    affected = set(result.scalars())
+
+    result = await session.execute(select(Order.product_id).where(*new_orders).distinct())
+    newly_bought = np.array(sorted(result.scalars()), dtype=np.int64)
+    if len(newly_bought):
+        result = await session.execute(
+            select(ProductRelated.product_id).where(
+                ProductRelated.related_ids.overlap(literal(newly_bought.tolist(), ARRAY(Integer)))
+            )
+        )
+        affected.update(result.scalars())
+    return np.array(sorted(affected), dtype=np.int64)
+
+
+async def _settled_high(session) -> int:
+    """
+    Highest order id below which no insert can still be in flight: that of
+    the newest order created RELATED_SETTLE_SECONDS ago or earlier. Orders
+    are single-statement transactions under statement_timeout, so none
+    stays uncommitted that long. Walks the primary key down from the top.
+    """
+    cutoff = func.now() - func.make_interval(0, 0, 0, 0, 0, 0, settings.RELATED_SETTLE_SECONDS)
+    result = await session.execute(
+        select(Order.id).where(Order.created_at <= cutoff).order_by(Order.id.desc()).limit(1)
+    )
+    return result.scalar() or 0
+
+
+async def refresh(full: bool = False) -> int:
+    """Update product_related; returns the number of products recomputed."""
+    async with db_session.AsyncSessionLocal() as session:
+        watermark_row = await session.get(JobWatermark, JOB_NAME)
+        watermark = 0 if full or watermark_row is None else watermark_row.last_id
+        high = await _settled_high(session)
+        max_product = (await session.execute(select(func.max(Order.product_id)))).scalar() or 0
+        if high <= watermark:
+            logger.info("No settled new orders since %d", watermark)
+            return 0
+
+        if full:
+            result = await session.execute(
+                select(Order.product_id).where(Order.user_id.is_not(None)).distinct()
+            )
+            affected = np.array(sorted(result.scalars()), dtype=np.int64)
+        else:
+            affected = await _affected_products(session, watermark, high)
+
+        n_products = max_product + 1
+        for start in range(0, len(affected), settings.RELATED_PRODUCT_SLICE):
+            rows = affected[start:start + settings.RELATED_PRODUCT_SLICE]
+            cooc = await _cooccurrence(session, high, rows, n_products, restrict=not full)
+            candidates = np.unique(np.concatenate([rows, cooc.indices]))
+            popularity = await _popularity(session, high, candidates)
+            await _store(session, _top_k(cooc, rows, popularity))
+            logger.info("Related products: %d / %d products", start + len(rows), len(affected))
+
+        if full:
+            # Products nobody has bought any more (e.g. deleted orders)
+            await session.execute(
+                delete(ProductRelated).where(~exists().where(
+                    Order.product_id == ProductRelated.product_id,
+                    Order.user_id.is_not(None),
+                ))
+            )
+        stmt = insert(JobWatermark).values(name=JOB_NAME, last_id=high)
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=[JobWatermark.name],
+            set_={"last_id": high, "updated_at": func.now()},
+        ))
+        await session.commit()
+        return len(affected)
+
+
+async def main_async(full: bool) -> None:
+    db_session.init_engine()
+    try:
+        started = time.perf_counter()
+        count = await refresh(full)
+        logger.info(
+            "Recomputed related products for %d products in %.1f s",
+            count,
+            time.perf_counter() - started,
+        )
+    finally:
+        await db_session.dispose_engine()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Refresh related-product recommendations")
+    parser.add_argument("--full", action="store_true", help="rebuild from all orders")
+    args = parser.parse_args()
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    asyncio.run(main_async(args.full))
+
+
+if __name__ == "__main__":
+    main()
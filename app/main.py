@@ -1,11 +1,61 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException, Response
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api.v1.endpoints import auth, users, products
+from app.core.admission import admission_control, pool_timeout_handler, statement_timeout_handler
+from app.core.compression import CompressionMiddleware
+from app.api.v1.endpoints import auth, media, profiles, users, products
+from app.auth import password
+from app.core.metrics import METRICS_CONTENT_TYPE, MetricsMiddleware, render_metrics
+from app.core.profiling import ProfilingMiddleware
+from app.core.sql_stats import SQLStatsMiddleware
+from app.db.session import StatementTimeoutError, dispose_engine, init_engine
+from app.db import warmup
+from app.services import catalog_snapshot, images, price_history
+from app.services.product_events import dispatcher as product_event_dispatcher
+
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_engine()
+    if settings.PASSWORD_CALIBRATE_ON_STARTUP:
+        loop = asyncio.get_running_loop()
+        ms_per_hash = await loop.run_in_executor(
+            password.get_hash_executor(), password.calibrate
+        )
+        logger.info(
+            "bcrypt cost %d: %.1f ms/hash on this host",
+            settings.PASSWORD_BCRYPT_ROUNDS,
+            ms_per_hash,
+        )
+    # /health answers right away; /ready only once warm-up has finished
+    warmup_task = asyncio.create_task(warmup.run_warmup())
+    if settings.PRODUCT_EVENTS_ENABLED:
+        await product_event_dispatcher.start()
+        if settings.CATALOG_SNAPSHOT_ENABLED:
+            await catalog_snapshot.builder.start()
+    await price_history.recorder.start()
+    yield
+    warmup_task.cancel()
+    await catalog_snapshot.builder.stop()
+    await product_event_dispatcher.stop()
+    await price_history.recorder.stop()
+    await dispose_engine()
+    password.shutdown_hash_executor()
+    images.shutdown_executor()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 if settings.BACKEND_CORS_ORIGINS:
@@ -17,22 +67,47 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+# Inside SQLStatsMiddleware, so profiles see the request's SQL statistics
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(SQLStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+app.add_exception_handler(StatementTimeoutError, statement_timeout_handler)
+
 app.include_router(
     auth.router,
     prefix=f"{settings.API_V1_STR}/auth",
-    tags=["authentication"]
+    tags=["authentication"],
+    dependencies=[Depends(admission_control)]
 )
 
 app.include_router(
     users.router,
     prefix=f"{settings.API_V1_STR}/users",
-    tags=["users"]
+    tags=["users"],
+    dependencies=[Depends(admission_control)]
 )
 
 app.include_router(
     products.router,
     prefix=f"{settings.API_V1_STR}/products",
-    tags=["products"]
+    tags=["products"],
+    dependencies=[Depends(admission_control)]
+)
+
+app.include_router(
+    profiles.router,
+    prefix=f"{settings.API_V1_STR}/profiles",
+    tags=["profiles"],
+    dependencies=[Depends(admission_control)]
+)
+
+app.include_router(
+    media.router,
+    prefix=settings.MEDIA_URL,
+    tags=["media"]
 )
 
 
@@ -47,4 +122,16 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/ready")
+def readiness_check():
+    if not warmup.is_ready():
+        raise HTTPException(status_code=503, detail="Warming up")
+    return {"status": "ready"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
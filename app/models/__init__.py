@@ -1,37 +1,33 @@
 # app/models/__init__.py
-import os
 import importlib
-from pathlib import Path
-from sqlalchemy.ext.declarative import declarative_base
 
-Base = declarative_base()
-model_names = ['Base']
+from app.models.base import Base
 
-# Get all .py files in this directory
-current_dir = Path(__file__).parent
-for py_file in current_dir.glob("*.py"):
-    if py_file.name.startswith("__") or py_file.name == "__init__.py":
-        continue
+# Model name -> module that defines it. Modules are imported on first
+# attribute access (``from app.models import Product``) or all at once via
+# load_all_models() when the full metadata is needed (Alembic).
+MODEL_MODULES = {
+    "User": "app.models.user",
+    "RefreshToken": "app.models.user",
+    "Product": "app.models.product",
+    "Order": "app.models.product",
+    "ProductEvent": "app.models.product",
+    "ProductPriceHistory": "app.models.product",
+    "ProductRelated": "app.models.product",
+    "JobWatermark": "app.models.job",
+}
 
-    module_name = py_file.stem  # Get filename without .py
 
-    try:
-        # Import the module
-        module = importlib.import_module(f".{module_name}", package="app.models")
+def __getattr__(name):
+    module_name = MODEL_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
 
-        # Find classes that inherit from Base
-        for attr_name in dir(module):
-            attr = getattr(module, attr_name)
-            if (isinstance(attr, type) and  # It's a class
-                    attr is not Base and  # Not Base itself
-                    Base in getattr(attr, '__bases__', [])):  # Inherits from Base
 
-                # Make it available at package level
-                globals()[attr_name] = attr
-                model_names.append(attr_name)
-                print(f"Auto-imported: {attr_name}")
+def load_all_models() -> None:
+    for module_name in set(MODEL_MODULES.values()):
+        importlib.import_module(module_name)
 
-    except ImportError as e:
-        print(f"Could not import {module_name}: {e}")
 
-__all__ = model_names
\ No newline at end of file
+__all__ = ["Base", "load_all_models", *MODEL_MODULES]
@@ -0,0 +1,12 @@
+from sqlalchemy import BigInteger, Column, DateTime, String
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+
+class JobWatermark(Base):
+    """Progress of incremental batch jobs: the last source row id processed."""
+    __tablename__ = "job_watermarks"
+
+    name = Column(String(100), primary_key=True)
+    last_id = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
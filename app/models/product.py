@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
-from sqlalchemy.sql import func
-from . import Base
+from sqlalchemy import BigInteger, Column, Index, Integer, String, Float, DateTime, Text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, REAL
+from sqlalchemy.sql import func, text
+from app.models.base import Base
 
 
 class Product(Base):
@@ -14,17 +15,55 @@ class Product(Base):
     rating = Column(Float, default=0.0)
     price = Column(Float, nullable=False)
     image_url = Column(String(500), nullable=True)
+    thumbnail_url = Column(String(500), nullable=True)
     description = Column(Text, nullable=True)
     quantity = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # One (column, id) index per sortable field, see queries.SORTABLE_FIELDS
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_vendor_id", "vendor", "id"),
+        Index("ix_products_article_id", "article", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_rating_id", "rating", "id"),
+        Index("ix_products_created_at_id", "created_at", "id"),
+        # Structured filters: equality column first, then the range column
+        Index("ix_products_category_price_id", "category", "price", "id"),
+        Index("ix_products_vendor_price_id", "vendor", "price", "id"),
+        # Partial indexes for in_stock=true, the common storefront case
+        Index(
+            "ix_products_in_stock_price_id",
+            "price",
+            "id",
+            postgresql_where=text("quantity > 0"),
+        ),
+        Index(
+            "ix_products_in_stock_category_id",
+            "category",
+            "id",
+            postgresql_where=text("quantity > 0"),
+        ),
+        # Trigram indexes for the substring (ILIKE '%...%') search
+        *(
+            Index(
+                f"ix_products_{column}_trgm",
+                column,
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+            )
+            for column in ("name", "vendor", "article", "category")
+        ),
+    )
+
 
 class Order(Base):
     __tablename__ = "orders"
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=True)
     product_name = Column(String(255), nullable=False)
     vendor = Column(String(100), nullable=False)
     article = Column(String(100), nullable=False)
@@ -34,3 +73,61 @@ class Order(Base):
     status = Column(String(50), default="pending")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        # Purchase histories for the related-products job
+        Index("ix_orders_user_id_product_id", "user_id", "product_id"),
+    )
+
+
+class ProductEvent(Base):
+    """
+    Transactional outbox of product changes.
+
+    Rows are written by the products_outbox trigger in the same transaction
+    as the change itself (see migration c3d9e7a1b5f2), so every committed
+    insert, update or delete of a product has exactly one event.
+    """
+    __tablename__ = "product_events"
+
+    id = Column(BigInteger, primary_key=True)
+    product_id = Column(Integer, nullable=False)
+    event_type = Column(String(20), nullable=False)  # created, updated, deleted
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class ProductPriceHistory(Base):
+    """
+    Append-only price and stock history, one row per change.
+
+    Written in batches by app.services.price_history, not in the request's
+    transaction.
+    """
+    __tablename__ = "product_price_history"
+
+    id = Column(BigInteger, primary_key=True)
+    product_id = Column(Integer, nullable=False)
+    price = Column(Float, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    recorded_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_product_price_history_product_id_recorded_at", "product_id", "recorded_at"),
+    )
+
+
+class ProductRelated(Base):
+    """
+    Top-K "bought together" neighbours of a product, most related first.
+
+    Precomputed by app.jobs.related_products; one row per product so the
+    lookup is a single primary key read.
+    """
+    __tablename__ = "product_related"
+
+    # A product's id, not generated here: no SERIAL sequence
+    product_id = Column(Integer, primary_key=True, autoincrement=False)
+    related_ids = Column(ARRAY(Integer), nullable=False)
+    scores = Column(ARRAY(REAL), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
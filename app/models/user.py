@@ -1,6 +1,6 @@
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text
 from sqlalchemy.sql import func
-from . import Base  # IMPORTANT: Import Base from current package
+from app.models.base import Base
 
 
 class User(Base):
@@ -33,6 +33,7 @@ class ProductUpdate(BaseModel):
 
 class ProductResponse(ProductBase):
     id: int
+    thumbnail_url: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -52,6 +53,7 @@ class OrderCreate(OrderBase):
 class OrderResponse(BaseModel):
     id: int
     product_id: int
+    user_id: Optional[int] = None
     product_name: str
     vendor: str
     article: str
@@ -64,3 +66,14 @@ class OrderResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class PriceHistoryPoint(BaseModel):
+    """Price and stock within one bucket: min, max and the last value."""
+    bucket: datetime
+    price_min: float
+    price_max: float
+    price_last: float
+    quantity_min: int
+    quantity_max: int
+    quantity_last: int
@@ -0,0 +1,66 @@
+"""
+Production launcher: gunicorn managing uvicorn workers.
+
+    python -m app.server [extra gunicorn options]
+
+Worker count, connection budgeting, recycling and graceful shutdown are
+configured in gunicorn_conf.py from the settings below.
+"""
+import math
+import os
+import sys
+
+from app.core.config import settings
+
+GUNICORN_CONF = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn_conf.py"
+)
+
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring affinity and the cgroup v2 quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    # Containers usually get a CPU quota rather than a smaller affinity set
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count() -> int:
+    # The app is async and bcrypt runs in a thread pool, so one worker per
+    # CPU is enough; more only splits the connection budget further.
+    return settings.WEB_CONCURRENCY or available_cpus()
+
+
+def check_connection_budget(workers: int) -> None:
+    """Refuse to start when the worker pools could exceed DB_CONNECTION_BUDGET."""
+    from app.db.session import pool_limits
+
+    pool_size, max_overflow = pool_limits(workers)
+    total = workers * (pool_size + max_overflow)
+    if total > settings.DB_CONNECTION_BUDGET:
+        raise RuntimeError(
+            f"{workers} workers x {pool_size + max_overflow} connections = {total} "
+            f"exceeds DB_CONNECTION_BUDGET={settings.DB_CONNECTION_BUDGET}; "
+            f"lower WEB_CONCURRENCY or raise the budget"
+        )
+
+
+def main() -> None:
+    from gunicorn.app.wsgiapp import run
+
+    sys.argv = ["gunicorn", "-c", GUNICORN_CONF, *sys.argv[1:], "app.main:app"]
+    run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+# app/services/catalog_snapshot.py
+"""
+Pre-built catalog snapshots for anonymous and low-churn readers.
+
+A background task writes the whole catalog, and one slice per category,
+as gzipped JSON files under CATALOG_SNAPSHOT_DIR/<version>/. It rebuilds
+when the product change feed reports changes, debounced: after
+CATALOG_SNAPSHOT_DEBOUNCE quiet seconds, or at the latest
+CATALOG_SNAPSHOT_MAX_DELAY seconds after the first change. Requests are
+then answered from a file with no query and no serialization.
+
+The version is the change-feed event id up to which all changes are
+included. Clients catch up on later changes from the outbox
+(change_events), so applying a snapshot plus its deltas is exact. Changes
+made while a build runs can also be in the snapshot itself; they are
+replayed too, which is harmless since events carry the whole row.
+
+Workers on one host share the directory. A file lock makes one of them
+build a version; the others pick up its manifest. Versions beyond
+CATALOG_SNAPSHOT_KEEP are removed only CATALOG_SNAPSHOT_GRACE seconds
+after being superseded, and a worker whose file is gone anyway re-reads
+the manifest before answering.
+"""
+import asyncio
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.db import session as db_session
+from app.models.product import Product, ProductEvent
+from app.schemas.product import ProductResponse
+from app.services.product_events import Event, Subscriber, dispatcher
+
+logger = logging.getLogger(__name__)
+
+ALL = ""  # manifest key of the full catalog
+MANIFEST = "manifest.json"
+STREAM_ROWS = 5000
+GZIP_LEVEL = 6
+
+
+def slice_name(category: str) -> str:
+    """File name of a slice; categories are free text, so hash them."""
+    if category == ALL:
+        return "all.json.gz"
+    return f"category-{hashlib.sha1(category.encode()).hexdigest()[:16]}.json.gz"
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class _SliceWriter:
+    """Streams `{"version": ..., "products": [...]}` into a gzip file."""
+
+    def __init__(self, path: Path, version: int):
+        self.file = gzip.open(path, "wb", compresslevel=GZIP_LEVEL)
+        self.file.write(f'{{"version":{version},"products":['.encode())
+        self.count = 0
+
+    def write(self, encoded: bytes) -> None:
+        if self.count:
+            self.file.write(b",")
+        self.file.write(encoded)
+        self.count += 1
+
+    def close(self) -> None:
+        self.file.write(b"]}")
+        self.file.close()
+
+
+def _write_rows(writers: Dict[str, _SliceWriter], directory: Path, version: int, rows: list) -> None:
+    # Runs in a thread: encoding and compression are the CPU-heavy part
+    for row in rows:
+        encoded = json.dumps(
+            dict(row), ensure_ascii=False, separators=(",", ":"), default=_json_default
+        ).encode()
+        for key in (ALL, row["category"]):
+            writer = writers.get(key)
+            if writer is None:
+                writer = writers[key] = _SliceWriter(directory / slice_name(key), version)
+            writer.write(encoded)
+
+
+class CatalogSnapshotBuilder:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._subscriber: Optional[Subscriber] = None
+        self.manifest: Optional[dict] = None
+
+    @property
+    def directory(self) -> Path:
+        return Path(settings.CATALOG_SNAPSHOT_DIR)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._subscriber = dispatcher.subscribe()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._subscriber is not None:
+            dispatcher.unsubscribe(self._subscriber)
+            self._subscriber = None
+
+    def _slice(self, manifest: Optional[dict], category: str) -> Optional[Tuple[Path, str]]:
+        if manifest is None or category not in manifest["slices"]:
+            return None
+        version = manifest["version"]
+        name = slice_name(category)
+        return self.directory / str(version) / name, f'"{version}-{name.split(".")[0]}"'
+
+    async def lookup(self, category: str = ALL) -> Optional[Tuple[Path, str]]:
+        """(file, etag) of the current snapshot of a slice, if there is one."""
+        found = self._slice(self.manifest, category)
+        if found is None or await asyncio.to_thread(found[0].is_file):
+            return found
+        # Removed after another worker published newer versions
+        manifest = await asyncio.to_thread(self._read_manifest)
+        if manifest is not None and (self.manifest is None or manifest["version"] > self.manifest["version"]):
+            self.manifest = manifest
+        found = self._slice(manifest, category)
+        if found is None or not await asyncio.to_thread(found[0].is_file):
+            return None
+        return found
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Catalog snapshot build failed")
+            await self._wait_for_changes()
+
+    async def _next_change(self, timeout: float) -> bool:
+        if self._subscriber.overflowed:
+            # Dropped by the dispatcher; everything is stale anyway
+            self._subscriber = dispatcher.subscribe()
+            return True
+        try:
+            await asyncio.wait_for(self._subscriber.queue.get(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _wait_for_changes(self) -> None:
+        # A dispatcher that drops us never wakes us up, so look again now
+        # and then instead of waiting on the queue indefinitely
+        while not await self._next_change(settings.CATALOG_SNAPSHOT_MAX_DELAY):
+            pass
+        first = time.monotonic()
+        while True:
+            remaining = first + settings.CATALOG_SNAPSHOT_MAX_DELAY - time.monotonic()
+            if remaining <= 0:
+                return
+            if not await self._next_change(min(settings.CATALOG_SNAPSHOT_DEBOUNCE, remaining)):
+                return
+
+    async def _current_version(self) -> int:
+        if dispatcher.last_id is not None:
+            return dispatcher.last_id
+        async with db_session.AsyncSessionLocal() as session:
+            result = await session.execute(select(func.max(ProductEvent.id)))
+            return result.scalar() or 0
+
+    async def refresh(self) -> None:
+        """Make self.manifest cover at least the current version."""
+        version = await self._current_version()
+        if self.manifest is not None and self.manifest["version"] >= version:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock = await asyncio.to_thread(self._lock)
+        try:
+            manifest = await asyncio.to_thread(self._read_manifest)
+            if manifest is None or manifest["version"] < version:
+                manifest = await self._build(version)
+            self.manifest = manifest
+        finally:
+            lock.close()
+
+    def _lock(self):
+        lock = open(self.directory / ".lock", "w")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _read_manifest(self) -> Optional[dict]:
+        try:
+            return json.loads((self.directory / MANIFEST).read_text())
+        except (OSError, ValueError):
+            return None
+
+    async def _build(self, version: int) -> dict:
+        started = time.perf_counter()
+        tmp = self.directory / f".build-{version}-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        writers: Dict[str, _SliceWriter] = {}
+        columns = [Product.__table__.c[name] for name in ProductResponse.model_fields]
+        try:
+            async with db_session.AsyncSessionLocal() as session:
+                result = await session.stream(
+                    select(*columns).order_by(Product.id).execution_options(yield_per=STREAM_ROWS)
+                )
+                async for rows in result.mappings().partitions():
+                    await asyncio.to_thread(_write_rows, writers, tmp, version, rows)
+            if ALL not in writers:
+                writers[ALL] = _SliceWriter(tmp / slice_name(ALL), version)
+            for writer in writers.values():
+                await asyncio.to_thread(writer.close)
+        except BaseException:
+            for writer in writers.values():
+                writer.file.close()
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        manifest = {
+            "version": version,
+            "built_at": datetime.now(timezone.utc).isoformat(),
+            "slices": {key: writer.count for key, writer in writers.items()},
+        }
+        await asyncio.to_thread(self._publish, tmp, manifest)
+        logger.info(
+            "Catalog snapshot %d: %d products, %d slices in %.1f s",
+            version, writers[ALL].count, len(writers), time.perf_counter() - started,
+        )
+        return manifest
+
+    def _publish(self, tmp: Path, manifest: dict) -> None:
+        target = self.directory / str(manifest["version"])
+        shutil.rmtree(target, ignore_errors=True)
+        tmp.rename(target)
+        manifest_tmp = self.directory / f".{MANIFEST}.{os.getpid()}"
+        manifest_tmp.write_text(json.dumps(manifest, ensure_ascii=False))
+        os.replace(manifest_tmp, self.directory / MANIFEST)
+        # Open file handles keep serving removed versions until closed.
+        # Other workers may still advertise a superseded version until they
+        # refresh, so it goes only once its successor is old enough.
+        versions = sorted(
+            (int(path.name) for path in self.directory.iterdir() if path.name.isdigit()),
+            reverse=True,
+        )
+        cutoff = time.time() - settings.CATALOG_SNAPSHOT_GRACE
+        keep = max(1, settings.CATALOG_SNAPSHOT_KEEP)
+        for newer, old in zip(versions[keep - 1:], versions[keep:]):
+            try:
+                superseded_at = (self.directory / str(newer)).stat().st_mtime
+            except OSError:
+                continue
+            if superseded_at < cutoff:
+                shutil.rmtree(self.directory / str(old), ignore_errors=True)
+
+
+builder = CatalogSnapshotBuilder()
+
+
+async def decompressed(path: Path, chunk_size: int = 64 * 1024):
+    """A snapshot for clients that don't accept gzip; rare, so not cached."""
+    with gzip.open(path, "rb") as fh:
+        while True:
+            chunk = await asyncio.to_thread(fh.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def change_events(since: int) -> Optional[List[Event]]:
+    """
+    Outbox events after snapshot version `since`, oldest first, at most
+    CATALOG_SNAPSHOT_DELTA_LIMIT and only up to the dispatcher's published
+    id, so a client never moves past an id still to be committed. None
+    when events after `since` have already been purged, i.e. the client
+    must fetch a new snapshot.
+    """
+    events = await dispatcher.replay(
+        since, settings.CATALOG_SNAPSHOT_DELTA_LIMIT, up_to=await dispatcher.published_id()
+    )
+    # Checked after reading, so a purge in between is not missed
+    if await dispatcher.purged_after(since):
+        return None
+    return events
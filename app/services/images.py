@@ -0,0 +1,276 @@
+# app/services/images.py
+"""
+Product image uploads.
+
+The multipart body is streamed straight to a temporary file under
+MEDIA_ROOT while it is hashed, so an upload never sits in memory whole.
+Decoding and thumbnailing run in a process pool; the CPU-bound Pillow work
+would otherwise stall the event loop (and, being GIL-bound, a thread pool).
+The request only waits for the original to be validated and stored; the
+thumbnail is made after the response and set by a later UPDATE, so
+thumbnail_url stays null until then.
+
+Files are content addressed: ``<MEDIA_ROOT>/<h[:2]>/<h>.<ext>`` where h is
+the SHA-256 of the file, so identical uploads share one file and a URL's
+content never changes, which is what makes immutable caching safe.
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db import queries
+from app.db import session as db_session
+
+logger = logging.getLogger(__name__)
+
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+MEDIA_TYPES = {
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+    "gif": "image/gif",
+}
+THUMBNAIL_FORMAT = "WEBP"
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the parent runs an event loop and thread pools
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def media_path(media_root: str, digest: str, ext: str) -> str:
+    return os.path.join(media_root, digest[:2], f"{digest}.{ext}")
+
+
+def media_url(relative_path: str) -> str:
+    return f"{settings.MEDIA_BASE_URL}{settings.MEDIA_URL}/{relative_path}"
+
+
+def _store(media_root: str, digest: str, ext: str, source_path: Optional[str] = None,
+           data: Optional[bytes] = None) -> str:
+    """Move a file or write bytes into place, unless the content already exists."""
+    path = media_path(media_root, digest, ext)
+    if os.path.exists(path):
+        if source_path is not None:
+            os.unlink(source_path)
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if source_path is None:
+        fd, source_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+    # Atomic: readers see either nothing or the complete file
+    os.replace(source_path, path)
+    return path
+
+
+def store_image(upload_path: str, digest: str, media_root: str) -> str:
+    """
+    Validate the upload and store it. Runs in a worker process.
+
+    Returns its path relative to media_root. Raises ValueError for anything
+    that is not a supported image.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(upload_path) as image:
+            image.verify()
+            ext = FORMAT_EXTENSIONS.get(image.format)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise ValueError("Not a valid image") from exc
+    if ext is None:
+        raise ValueError(f"Unsupported image format: {image.format}")
+    return os.path.relpath(_store(media_root, digest, ext, source_path=upload_path), media_root)
+
+
+def make_thumbnail(original: str, media_root: str, thumbnail_size: int) -> str:
+    """
+    Store a thumbnail of a stored original. Runs in a worker process.
+
+    Both paths are relative to media_root.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(os.path.join(media_root, original)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((thumbnail_size, thumbnail_size))
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, THUMBNAIL_FORMAT, quality=80, method=4)
+
+    thumbnail = buffer.getvalue()
+    path = _store(
+        media_root,
+        hashlib.sha256(thumbnail).hexdigest(),
+        FORMAT_EXTENSIONS[THUMBNAIL_FORMAT],
+        data=thumbnail,
+    )
+    return os.path.relpath(path, media_root)
+
+
+class _FilePartCollector:
+    """python-multipart callbacks that keep only the data of one file field."""
+
+    def __init__(self, field_name: str):
+        self.field_name = field_name.encode()
+        self.chunks: List[bytes] = []
+        self.found = False
+        self._in_field = False
+        self._headers = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        # Only the first matching part counts
+        self._in_field = (
+            not self.found
+            and options.get(b"name") == self.field_name
+            and b"filename" in options
+        )
+
+    def on_part_data(self, data, start, end):
+        if self._in_field:
+            self.chunks.append(data[start:end])
+
+    def on_part_end(self):
+        if self._in_field:
+            self.found = True
+            self._in_field = False
+
+
+async def receive_upload(request: Request, field_name: str = "file") -> Tuple[str, str, int]:
+    """
+    Stream one file field of a multipart request to a temporary file.
+
+    Returns (path, sha256 hex digest, size). The caller owns the file.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=415, detail="Expected multipart/form-data")
+
+    collector = _FilePartCollector(field_name)
+    parser = MultipartParser(boundary, collector.callbacks())
+    digest = hashlib.sha256()
+    size = 0
+
+    tmp_dir = os.path.join(settings.MEDIA_ROOT, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=tmp_dir, suffix=".upload")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                if not collector.chunks:
+                    continue
+                data = b"".join(collector.chunks)
+                collector.chunks.clear()
+                size += len(data)
+                if size > settings.IMAGE_MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Image too large")
+                digest.update(data)
+                await run_in_threadpool(fh.write, data)
+            parser.finalize()
+        if not collector.found or size == 0:
+            raise HTTPException(status_code=400, detail=f"Missing file field '{field_name}'")
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest(), size
+
+
+async def save_product_image(request: Request) -> str:
+    """
+    Receive, validate and store an uploaded image; return its path relative
+    to MEDIA_ROOT.
+    """
+    path, digest, _ = await receive_upload(request)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            get_executor(), store_image, path, digest, settings.MEDIA_ROOT
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    finally:
+        # store_image moves the file into place; anything left is a reject
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+async def attach_thumbnail(product_id: int, original: str) -> None:
+    """
+    Make the thumbnail of a stored original and set it on the product,
+    unless the product has had another image set meanwhile. Runs after
+    the upload's response has been sent.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        thumbnail = await loop.run_in_executor(
+            get_executor(),
+            make_thumbnail,
+            original,
+            settings.MEDIA_ROOT,
+            settings.IMAGE_THUMBNAIL_SIZE,
+        )
+        async with db_session.AsyncSessionLocal() as session:
+            await session.execute(queries.set_product_thumbnail(
+                product_id, media_url(original), media_url(thumbnail)
+            ))
+            await session.commit()
+    except Exception:
+        logger.exception("Thumbnail for product %d failed", product_id)
@@ -0,0 +1,127 @@
+# app/services/price_history.py
+"""
+Price and stock history.
+
+Request handlers only append to an in-memory buffer after their commit;
+a background task writes the buffer as one multi-row INSERT every
+PRICE_HISTORY_FLUSH_INTERVAL seconds (or sooner once a batch is full), so
+recording history adds no statements to the write path. The buffer is
+flushed on shutdown; rows buffered in a worker that crashes are lost.
+
+Reads aggregate the series into fixed-width time buckets in SQL, so the
+response size depends on the requested resolution, not on how often the
+product changed.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import func, insert, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from app.core.config import settings
+from app.db import session as db_session
+from app.models.product import ProductPriceHistory
+
+logger = logging.getLogger(__name__)
+
+
+class PriceHistoryRecorder:
+    def __init__(self):
+        self._rows: List[dict] = []
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def record(self, product_id: int, price: float, quantity: int) -> None:
+        if len(self._rows) >= settings.PRICE_HISTORY_MAX_BUFFER:
+            # The database is not keeping up; shed history, not requests
+            logger.warning("Price history buffer full, dropping change of product %s", product_id)
+            return
+        self._rows.append({
+            "product_id": product_id,
+            "price": price,
+            "quantity": quantity,
+            "recorded_at": datetime.now(timezone.utc),
+        })
+        if len(self._rows) >= settings.PRICE_HISTORY_BATCH_SIZE:
+            self._wake.set()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            # Let a flush in progress finish rather than cancelling it: a
+            # cancelled commit may still have gone through, and flushing
+            # the same rows again would insert them twice.
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await self.flush()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(
+                    self._wake.wait(), timeout=settings.PRICE_HISTORY_FLUSH_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Price history flush failed, will retry")
+
+    async def flush(self) -> None:
+        while self._rows:
+            batch = self._rows[:settings.PRICE_HISTORY_BATCH_SIZE]
+            async with db_session.AsyncSessionLocal() as session:
+                await session.execute(insert(ProductPriceHistory).values(batch))
+                await session.commit()
+            # Only drop what was written; failures keep the rows for retry
+            del self._rows[:len(batch)]
+
+
+recorder = PriceHistoryRecorder()
+
+
+def history_query(product_id: int, start: datetime, end: datetime, resolution: int):
+    """
+    Series of product_id between start and end in buckets of `resolution`
+    seconds, with min, max and last price and quantity per bucket.
+    """
+    # Inlined rather than bound: the bucket expression must be textually the
+    # same in SELECT and GROUP BY for Postgres to match them.
+    width = literal_column(str(int(resolution)))
+    epoch = func.extract("epoch", ProductPriceHistory.recorded_at)
+    bucket = func.to_timestamp(func.floor(epoch / width) * width).label("bucket")
+
+    def last(column):
+        return func.array_agg(
+            aggregate_order_by(column, ProductPriceHistory.recorded_at.desc())
+        )[1]
+
+    return (
+        select(
+            bucket,
+            func.min(ProductPriceHistory.price).label("price_min"),
+            func.max(ProductPriceHistory.price).label("price_max"),
+            last(ProductPriceHistory.price).label("price_last"),
+            func.min(ProductPriceHistory.quantity).label("quantity_min"),
+            func.max(ProductPriceHistory.quantity).label("quantity_max"),
+            last(ProductPriceHistory.quantity).label("quantity_last"),
+        )
+        .where(
+            ProductPriceHistory.product_id == product_id,
+            ProductPriceHistory.recorded_at >= start,
+            ProductPriceHistory.recorded_at < end,
+        )
+        .group_by(bucket)
+        .order_by(bucket)
+    )
@@ -0,0 +1,249 @@
+# app/services/product_events.py
+"""
+Fan-out of the product_events outbox to live subscribers.
+
+Each worker runs one dispatcher that polls the outbox for ids above the
+last one it delivered and pushes new events to its in-process subscriber
+queues. Subscribers that reconnect pass the last id they saw and are
+replayed from the table, so nothing is lost between connections.
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from fastapi import Request
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.db import session as db_session
+from app.models.job import JobWatermark
+from app.models.product import ProductEvent
+
+logger = logging.getLogger(__name__)
+
+# Seconds between purges of events older than the retention window
+CLEANUP_INTERVAL = 3600
+# job_watermarks row holding the highest event id purged so far
+PURGED_WATERMARK = "product_events_purged"
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    product_id: int
+    event_type: str
+    payload: dict
+
+    @classmethod
+    def from_row(cls, row: ProductEvent) -> "Event":
+        return cls(row.id, row.product_id, row.event_type, row.payload)
+
+    def to_sse(self) -> str:
+        data = json.dumps(self.payload, ensure_ascii=False, separators=(",", ":"))
+        return f"id: {self.id}\nevent: {self.event_type}\ndata: {data}\n\n"
+
+
+class Subscriber:
+    def __init__(self, maxsize: int):
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=maxsize)
+        # Set when the client fell too far behind; it has to reconnect and
+        # replay from its last event id.
+        self.overflowed = False
+
+
+class ProductEventDispatcher:
+    def __init__(self):
+        self._subscribers: Set[Subscriber] = set()
+        self._last_id: Optional[int] = None
+        self._gaps: Dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._last_cleanup = 0.0
+        self._started = asyncio.Event()
+
+    @property
+    def last_id(self) -> Optional[int]:
+        """Id up to which every event has been published (no gaps left)."""
+        return self._last_id
+
+    async def published_id(self) -> Optional[int]:
+        """last_id once the dispatcher has started; None if it isn't running."""
+        if self._task is None:
+            return None
+        await self._started.wait()
+        return self._last_id
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._started.clear()
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(maxsize=settings.PRODUCT_EVENTS_QUEUE_SIZE)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    async def replay(self, after_id: int, limit: int, up_to: Optional[int] = None) -> List[Event]:
+        """
+        Events after `after_id`, oldest first. Replays for clients pass
+        up_to=last_id: later ids may sit behind a gap that is still to be
+        committed, and a client that skipped past it would never see it.
+        """
+        stmt = select(ProductEvent).where(ProductEvent.id > after_id)
+        if up_to is not None:
+            stmt = stmt.where(ProductEvent.id <= up_to)
+        async with db_session.AsyncSessionLocal() as session:
+            result = await session.execute(stmt.order_by(ProductEvent.id).limit(limit))
+            return [Event.from_row(row) for row in result.scalars()]
+
+    async def purged_after(self, after_id: int) -> bool:
+        """Whether events after `after_id` have already been purged."""
+        async with db_session.AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(JobWatermark.last_id).where(JobWatermark.name == PURGED_WATERMARK)
+            )
+            purged = result.scalar()
+        # Compared with the purge watermark rather than min(id): sequence
+        # gaps from rolled back inserts are not purges
+        return purged is not None and purged > after_id
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self._last_id is None:
+                    async with db_session.AsyncSessionLocal() as session:
+                        result = await session.execute(select(func.max(ProductEvent.id)))
+                        self._last_id = result.scalar() or 0
+                    self._started.set()
+                await self._poll()
+                await self._cleanup()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Product event dispatch failed")
+            await asyncio.sleep(settings.PRODUCT_EVENTS_POLL_INTERVAL)
+
+    async def _poll(self) -> None:
+        events = await self.replay(self._last_id, settings.PRODUCT_EVENTS_BATCH)
+
+        # Ids are allocated at insert but become visible at commit, so a
+        # missing id may still show up. Hold back everything after a gap
+        # until it fills or is old enough to be a rolled back transaction.
+        now = time.monotonic()
+        expected = self._last_id + 1
+        deliverable = []
+        for event in events:
+            if event.id != expected:
+                first_seen = self._gaps.setdefault(expected, now)
+                if now - first_seen < settings.PRODUCT_EVENTS_GAP_TIMEOUT:
+                    break
+                self._gaps.pop(expected, None)
+            deliverable.append(event)
+            expected = event.id + 1
+
+        for event in deliverable:
+            self._publish(event)
+        if deliverable:
+            self._last_id = deliverable[-1].id
+            self._gaps = {gap: seen for gap, seen in self._gaps.items() if gap > self._last_id}
+
+    def _publish(self, event: Event) -> None:
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscriber.overflowed = True
+                self._subscribers.discard(subscriber)
+
+    async def _cleanup(self) -> None:
+        now = time.monotonic()
+        if now - self._last_cleanup < CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now
+        purged = (
+            delete(ProductEvent)
+            .where(
+                ProductEvent.created_at
+                < func.now() - func.make_interval(0, 0, 0, 0, settings.PRODUCT_EVENTS_RETENTION_HOURS)
+            )
+            .returning(ProductEvent.id)
+            .cte("purged")
+        )
+        # Delete and advance the purge watermark in one statement
+        stmt = insert(JobWatermark).from_select(
+            ["name", "last_id"],
+            select(literal(PURGED_WATERMARK), func.max(purged.c.id)).having(func.count() > 0),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[JobWatermark.name],
+            set_={
+                "last_id": func.greatest(JobWatermark.last_id, stmt.excluded.last_id),
+                "updated_at": func.now(),
+            },
+        )
+        async with db_session.AsyncSessionLocal() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+
+dispatcher = ProductEventDispatcher()
+
+
+async def sse_stream(request: Request, last_event_id: Optional[int]) -> AsyncIterator[str]:
+    """Server-Sent Events: replay after last_event_id, then live events."""
+    subscriber = dispatcher.subscribe()
+    try:
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+
+        # Subscribe before replaying so nothing published meanwhile is lost;
+        # duplicates are skipped by id below.
+        delivered = last_event_id if last_event_id is not None else dispatcher.last_id or 0
+        if last_event_id is not None:
+            events = await dispatcher.replay(
+                last_event_id,
+                settings.PRODUCT_EVENTS_REPLAY_LIMIT,
+                up_to=await dispatcher.published_id(),
+            )
+            if (
+                len(events) >= settings.PRODUCT_EVENTS_REPLAY_LIMIT
+                or await dispatcher.purged_after(last_event_id)
+            ):
+                # Too far behind, or events it missed were purged: refetch
+                # the list
+                yield "event: reset\ndata: {}\n\n"
+                return
+            for event in events:
+                yield event.to_sse()
+                delivered = event.id
+
+        while not await request.is_disconnected():
+            if subscriber.overflowed:
+                yield "event: reset\ndata: {}\n\n"
+                return
+            try:
+                event = await asyncio.wait_for(
+                    subscriber.queue.get(), timeout=settings.SSE_HEARTBEAT_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event.id > delivered:
+                yield event.to_sse()
+                delivered = event.id
+    finally:
+        dispatcher.unsubscribe(subscriber)
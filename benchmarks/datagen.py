@@ -0,0 +1,318 @@
+"""
+Synthetic dataset generator for scale testing.
+
+Appends users, products and orders to the database configured in .env /
+DATABASE_URL, loading them with COPY over several connections while
+worker processes generate the next chunks:
+
+    alembic upgrade head
+    python -m benchmarks.datagen --users 10000 --products 100000 --orders 1000000
+    python -m benchmarks.datagen --users 1000000 --products 10000000 \\
+        --orders 100000000 --jobs 8 --seed 42
+
+Data is deterministic for a given --seed and starting ids:
+- product names are Russian or English, built from a shared vocabulary,
+  so the loadtest search terms ("phone", "чехол", ...) hit;
+- prices are log-uniform, and stock, ratings and categories vary;
+- order popularity is Zipf-like (--skew), with a few best sellers and a
+  long tail, and so is the number of orders per user.
+
+Every product attribute is a pure function of its id, so orders can copy
+product name, vendor, article and price without reading products back.
+
+The products outbox trigger is disabled during the load, so the bulk
+insert does not turn into millions of change events. Load into an empty
+database, or expect index maintenance to dominate the time. Run ANALYZE
+afterwards (--analyze) before checking plans.
+"""
+import argparse
+import asyncio
+import io
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import asyncpg
+import numpy as np
+
+from app.core.config import settings
+
+CATEGORIES = [
+    ("Смартфоны", "Smartphones"), ("Аксессуары", "Accessories"), ("Книги", "Books"),
+    ("Обувь", "Shoes"), ("Освещение", "Lighting"), ("Кабели", "Cables"),
+    ("Ноутбуки", "Laptops"), ("Аудио", "Audio"), ("Дом", "Home"), ("Спорт", "Sports"),
+    ("Игрушки", "Toys"), ("Инструменты", "Tools"),
+]
+VENDORS = [
+    "Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Tyrell",
+    "Сбертех", "Ростех", "Эльбрус", "Байкал", "Сириус", "Вектор", "Орбита", "Полюс",
+]
+NOUNS = [
+    ("телефон", "phone"), ("чехол", "case"), ("кабель", "cable"), ("книга", "book"),
+    ("кроссовки", "shoe"), ("лампа", "lamp"), ("наушники", "headphones"),
+    ("ноутбук", "laptop"), ("зарядка", "charger"), ("колонка", "speaker"),
+    ("рюкзак", "backpack"), ("часы", "watch"), ("мышь", "mouse"), ("клавиатура", "keyboard"),
+]
+ADJECTIVES = [
+    ("новый", "new"), ("компактный", "compact"), ("беспроводной", "wireless"),
+    ("прочный", "rugged"), ("лёгкий", "light"), ("классический", "classic"),
+    ("умный", "smart"), ("профессиональный", "pro"), ("детский", "kids"),
+]
+FIRST_NAMES = ["Анна", "Иван", "Мария", "Пётр", "Olga", "John", "Emma", "Liam", "Дмитрий", "Sofia"]
+LAST_NAMES = ["Иванова", "Смирнов", "Кузнецова", "Попов", "Smith", "Brown", "Garcia", "Miller"]
+STATUSES = ["pending", "paid", "shipped", "completed", "cancelled"]
+STATUS_WEIGHTS = [0.1, 0.15, 0.15, 0.55, 0.05]
+
+USER_COLUMNS = ["id", "email", "username", "full_name", "hashed_password", "is_active", "is_superuser", "created_at"]
+PRODUCT_COLUMNS = ["id", "name", "category", "vendor", "article", "rating", "price", "description", "quantity", "created_at"]
+ORDER_COLUMNS = ["id", "product_id", "user_id", "product_name", "vendor", "article", "quantity", "price", "total_amount", "status", "created_at"]
+
+# Spread of created_at, ending now
+HISTORY_SECONDS = 365 * 24 * 3600
+
+
+def _mix(seed: int, ids: np.ndarray, salt: int) -> np.ndarray:
+    """splitmix64 of (seed, salt, id): independent pseudo-random bits per id."""
+    with np.errstate(over="ignore"):
+        z = ids.astype(np.uint64) + np.uint64((seed * 0x9E3779B97F4A7C15 + salt * 0xBF58476D1CE4E5B9) % 2**64)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _pick(bits: np.ndarray, n: int) -> np.ndarray:
+    return (bits % np.uint64(n)).astype(np.int64)
+
+
+def _csv(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def product_attributes(seed: int, ids: np.ndarray) -> Dict[str, list]:
+    """Name, category, vendor, article, price, ... of each product id."""
+    h = _mix(seed, ids, 1)
+    h2 = _mix(seed, ids, 2)
+    russian = (h >> np.uint64(63)).astype(bool)
+    noun = _pick(h, len(NOUNS))
+    adjective = _pick(h >> np.uint64(8), len(ADJECTIVES))
+    category = _pick(h >> np.uint64(16), len(CATEGORIES))
+    vendor = _pick(h >> np.uint64(24), len(VENDORS))
+    # Log-uniform between 99 and 199 999
+    fraction = (h2 & np.uint64(0xFFFFFF)).astype(np.float64) / 0xFFFFFF
+    price = np.round(np.exp(math.log(99) + fraction * math.log(199_999 / 99)), 2)
+    rating = np.round(((h2 >> np.uint64(24)) & np.uint64(0xFF)).astype(np.float64) / 255 * 5, 1)
+    # About 15% out of stock
+    quantity = np.where(
+        _pick(h2 >> np.uint64(32), 100) < 15, 0, _pick(h2 >> np.uint64(40), 500) + 1
+    )
+    names, categories = [], []
+    for i, product_id in enumerate(ids.tolist()):
+        lang = 0 if russian[i] else 1
+        names.append(
+            f"{ADJECTIVES[adjective[i]][lang].capitalize()} {NOUNS[noun[i]][lang]} "
+            f"{VENDORS[vendor[i]]} {product_id % 1000:03d}"
+        )
+        categories.append(CATEGORIES[category[i]][lang])
+    return {
+        "name": names,
+        "category": categories,
+        "vendor": [VENDORS[v] for v in vendor.tolist()],
+        "article": [f"SYN-{product_id:010d}" for product_id in ids.tolist()],
+        "price": price.tolist(),
+        "rating": rating.tolist(),
+        "quantity": quantity.tolist(),
+    }
+
+
+def _timestamps(seed: int, ids: np.ndarray, salt: int, now: float) -> List[str]:
+    offsets = _pick(_mix(seed, ids, salt), HISTORY_SECONDS)
+    stamps = (np.int64(now) - offsets).astype("datetime64[s]")
+    return [f"{stamp}+00" for stamp in np.datetime_as_string(stamps)]
+
+
+def user_chunk(seed: int, first_id: int, count: int, now: float, hashed_password: str) -> bytes:
+    ids = np.arange(first_id, first_id + count, dtype=np.int64)
+    h = _mix(seed, ids, 10)
+    first = _pick(h, len(FIRST_NAMES)).tolist()
+    last = _pick(h >> np.uint64(16), len(LAST_NAMES)).tolist()
+    created = _timestamps(seed, ids, 11, now)
+    out = io.StringIO()
+    for i, user_id in enumerate(ids.tolist()):
+        out.write(
+            f"{user_id},syn{user_id}@example.test,syn{user_id},"
+            f"{_csv(FIRST_NAMES[first[i]] + ' ' + LAST_NAMES[last[i]])},"
+            f"{hashed_password},t,f,{created[i]}\n"
+        )
+    return out.getvalue().encode()
+
+
+def product_chunk(seed: int, first_id: int, count: int, now: float) -> bytes:
+    ids = np.arange(first_id, first_id + count, dtype=np.int64)
+    attrs = product_attributes(seed, ids)
+    created = _timestamps(seed, ids, 12, now)
+    out = io.StringIO()
+    for i, product_id in enumerate(ids.tolist()):
+        out.write(
+            f"{product_id},{_csv(attrs['name'][i])},{_csv(attrs['category'][i])},"
+            f"{_csv(attrs['vendor'][i])},{attrs['article'][i]},{attrs['rating'][i]},"
+            f"{attrs['price'][i]},{_csv('Синтетический товар / synthetic product')},"
+            f"{attrs['quantity'][i]},{created[i]}\n"
+        )
+    return out.getvalue().encode()
+
+
+def _skewed(seed: int, ids: np.ndarray, salt: int, lo: int, n: int, skew: float) -> np.ndarray:
+    """
+    Ids in [lo, lo + n) with a power-law rank distribution, scattered over
+    the range by a fixed permutation so popular ids are not all adjacent.
+    """
+    u = (_mix(seed, ids, salt) >> np.uint64(11)).astype(np.float64) / 2**53
+    rank = np.minimum((n * u ** skew).astype(np.int64), n - 1)
+    step = 2_654_435_761
+    while math.gcd(step, n) != 1:
+        step += 2
+    return lo + (rank * step) % n
+
+
+def order_chunk(seed: int, first_id: int, count: int, now: float,
+                products: Tuple[int, int], users: Tuple[int, int], skew: float) -> bytes:
+    ids = np.arange(first_id, first_id + count, dtype=np.int64)
+    product_ids = _skewed(seed, ids, 20, products[0], products[1], skew)
+    user_ids = _skewed(seed, ids, 21, users[0], users[1], max(1.0, skew - 1))
+    attrs = product_attributes(seed, product_ids)
+    h = _mix(seed, ids, 22)
+    quantity = (_pick(h, 3) + 1).tolist()
+    status_index = np.searchsorted(
+        np.cumsum(STATUS_WEIGHTS),
+        (h >> np.uint64(8) & np.uint64(0xFFFF)).astype(np.float64) / 0x10000,
+    ).tolist()
+    created = _timestamps(seed, ids, 23, now)
+    out = io.StringIO()
+    for i, order_id in enumerate(ids.tolist()):
+        price = attrs["price"][i]
+        out.write(
+            f"{order_id},{product_ids[i]},{user_ids[i]},{_csv(attrs['name'][i])},"
+            f"{_csv(attrs['vendor'][i])},{attrs['article'][i]},{quantity[i]},{price},"
+            f"{round(price * quantity[i], 2)},{STATUSES[status_index[i]]},{created[i]}\n"
+        )
+    return out.getvalue().encode()
+
+
+class Loader:
+    def __init__(self, pool: asyncpg.Pool, executor: ProcessPoolExecutor, jobs: int, chunk_size: int):
+        self.pool = pool
+        self.executor = executor
+        self.jobs = jobs
+        self.chunk_size = chunk_size
+
+    async def load(self, table: str, columns: List[str], first_id: int, total: int,
+                   generate: Callable[..., bytes], *args) -> None:
+        if total <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.jobs)
+        done = 0
+        started = time.perf_counter()
+
+        async def one(chunk_first: int, count: int) -> None:
+            nonlocal done
+            async with semaphore:
+                data = await loop.run_in_executor(
+                    self.executor, generate, *args[:1], chunk_first, count, *args[1:]
+                )
+                async with self.pool.acquire() as conn:
+                    await conn.copy_to_table(
+                        table, source=io.BytesIO(data), columns=columns, format="csv"
+                    )
+            done += count
+            rate = done / max(time.perf_counter() - started, 1e-9)
+            print(f"\r{table:<8} {done:>12,} / {total:,} ({rate:,.0f} rows/s)", end="", flush=True)
+
+        await asyncio.gather(*(
+            one(first_id + offset, min(self.chunk_size, total - offset))
+            for offset in range(0, total, self.chunk_size)
+        ))
+        print()
+
+
+async def _next_id(conn: asyncpg.Connection, table: str) -> int:
+    return (await conn.fetchval(f"SELECT coalesce(max(id), 0) FROM {table}")) + 1
+
+
+async def _sync_sequence(conn: asyncpg.Connection, table: str) -> None:
+    await conn.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"(SELECT coalesce(max(id), 1) FROM {table}))"
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+    now = time.time()
+    pool = await asyncpg.create_pool(dsn, min_size=1, max_size=args.jobs)
+    try:
+        async with pool.acquire() as conn:
+            first_user = await _next_id(conn, "users")
+            first_product = await _next_id(conn, "products")
+            first_order = await _next_id(conn, "orders")
+            await conn.execute("ALTER TABLE products DISABLE TRIGGER products_outbox")
+
+        try:
+            with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+                loader = Loader(pool, executor, args.jobs, args.chunk_size)
+                if args.users:
+                    from app.auth.password import get_password_hash
+                    # Everyone gets the same password ("password") and hash
+                    hashed = get_password_hash("password")
+                    await loader.load(
+                        "users", USER_COLUMNS, first_user, args.users,
+                        user_chunk, args.seed, now, hashed,
+                    )
+                await loader.load(
+                    "products", PRODUCT_COLUMNS, first_product, args.products,
+                    product_chunk, args.seed, now,
+                )
+                await loader.load(
+                    "orders", ORDER_COLUMNS, first_order, args.orders,
+                    order_chunk, args.seed, now,
+                    (first_product, args.products), (first_user, args.users), args.skew,
+                )
+        finally:
+            async with pool.acquire() as conn:
+                await conn.execute("ALTER TABLE products ENABLE TRIGGER products_outbox")
+
+        async with pool.acquire() as conn:
+            for table in ("users", "products", "orders"):
+                await _sync_sequence(conn, table)
+            if args.analyze:
+                print("ANALYZE ...")
+                await conn.execute("ANALYZE users, products, orders")
+    finally:
+        await pool.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skew", type=float, default=3.0, help="popularity skew, 1 = uniform")
+    parser.add_argument("--jobs", type=int, default=4, help="generator processes and COPY connections")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="rows per COPY")
+    parser.add_argument("--analyze", action="store_true", help="ANALYZE the tables afterwards")
+    args = parser.parse_args()
+
+    if args.orders and (not args.products or not args.users):
+        parser.error("orders need --products and --users in the same run")
+
+    started = time.perf_counter()
+    asyncio.run(run(args))
+    print(f"Done in {time.perf_counter() - started:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Import-time budget for the application.
+
+Imports app.main in a fresh interpreter with `-X importtime` and fails
+(exit code 1) when the import gets slower than the budget, or when it has
+side effects such as creating the database engine:
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --total-budget-ms 1500 --app-budget-ms 150
+
+The total budget covers third-party imports (FastAPI, SQLAlchemy, ...);
+the app budget only counts the self time of app.* modules, which is the
+part this repository controls and the more stable signal in CI. pytest
+checks the default budgets (tests/test_import_time.py).
+"""
+import argparse
+import subprocess
+import sys
+from typing import Dict, Tuple
+
+TOTAL_BUDGET_MS = 1500.0
+APP_BUDGET_MS = 150.0
+
+PROBE = (
+    "import app.main, app.db.session as session, sys; "
+    "sys.exit(0 if session.engine is None else 3)"
+)
+
+
+def measure(runs: int) -> Tuple[float, float, Dict[str, float]]:
+    best_total = best_app = float("inf")
+    app_modules: Dict[str, float] = {}
+
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode == 3:
+            raise RuntimeError("importing app.main created a database engine")
+        if proc.returncode != 0:
+            raise RuntimeError(f"importing app.main failed:\n{proc.stderr}")
+
+        total = app_self = 0.0
+        modules: Dict[str, float] = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            name = name.strip()
+            if name == "app.main":
+                total = int(cumulative_us) / 1000
+            if name == "app" or name.startswith("app."):
+                modules[name] = int(self_us) / 1000
+                app_self += int(self_us) / 1000
+
+        if total < best_total:
+            best_total, best_app, app_modules = total, app_self, modules
+
+    return best_total, best_app, app_modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--total-budget-ms", type=float, default=TOTAL_BUDGET_MS)
+    parser.add_argument("--app-budget-ms", type=float, default=APP_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3, help="best of N fresh interpreters")
+    args = parser.parse_args()
+
+    try:
+        total, app_self, modules = measure(args.runs)
+    except RuntimeError as exc:
+        print(f"FAIL {exc}", file=sys.stderr)
+        return 1
+    for name, ms in sorted(modules.items(), key=lambda item: -item[1])[:10]:
+        print(f"{ms:8.1f} ms  {name}")
+    print(f"app.main cumulative: {total:.1f} ms (budget {args.total_budget_ms:.0f} ms)")
+    print(f"app.* self time:     {app_self:.1f} ms (budget {args.app_budget_ms:.0f} ms)")
+
+    failed = False
+    if total > args.total_budget_ms:
+        print("FAIL app.main import exceeds the total budget", file=sys.stderr)
+        failed = True
+    if app_self > args.app_budget_ms:
+        print("FAIL app.* modules exceed their import budget", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
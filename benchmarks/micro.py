@@ -0,0 +1,233 @@
+"""
+Microbenchmarks for per-request primitives: JWT handling, password
+verification and response model validation/serialization.
+
+No database is needed. Every benchmark reports ops/sec and the peak memory
+allocated per call (tracemalloc):
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --compare benchmarks/baselines/micro.json
+    python -m benchmarks.micro --output benchmarks/baselines/micro.json
+
+Baselines are machine specific; refresh them on the CI runner when the
+hardware, the dependencies or the response schemas change. The "meta"
+section records what a baseline was measured on, and --compare warns when
+it differs from the current environment.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Callable, Dict, List
+
+from jose import jwt
+from pydantic import TypeAdapter
+
+from app.auth.jwt_handler import jwt_handler
+from app.auth.password import get_password_hash, verify_password
+from app.core.config import settings
+from app.models.product import Order, Product
+from app.schemas.product import OrderResponse, ProductResponse
+
+SIZES = (1, 100, 1000)
+# Distributions whose version changes the numbers
+PACKAGES = ("pydantic", "pydantic-core", "python-jose", "bcrypt", "passlib", "SQLAlchemy")
+
+
+def make_products(count: int) -> List[Product]:
+    now = datetime.now(timezone.utc)
+    return [
+        Product(
+            id=i,
+            name=f"Product {i}",
+            category="Electronics",
+            vendor="Vendor",
+            article=f"ART-{i:08d}",
+            rating=4.5,
+            price=99.9,
+            image_url=f"https://example.com/{i}.jpg",
+            thumbnail_url=f"https://example.com/{i}.webp",
+            description="A reasonably sized product description " * 3,
+            quantity=10,
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(count)
+    ]
+
+
+def make_orders(count: int) -> List[Order]:
+    now = datetime.now(timezone.utc)
+    return [
+        Order(
+            id=i,
+            product_id=i,
+            user_id=i,
+            product_name=f"Product {i}",
+            vendor="Vendor",
+            article=f"ART-{i:08d}",
+            quantity=2,
+            price=99.9,
+            total_amount=199.8,
+            status="pending",
+            created_at=now,
+            updated_at=None,
+        )
+        for i in range(count)
+    ]
+
+
+def build_benchmarks(include_bcrypt: bool) -> Dict[str, Callable[[], object]]:
+    access_token = jwt_handler.create_access_token(user_id=42)
+    benchmarks = {
+        "jwt.create_access_token": lambda: jwt_handler.create_access_token(user_id=42),
+        "jwt.verify_token": lambda: jwt_handler.verify_token(access_token, "access"),
+        "jwt.decode (get_current_user)": lambda: jwt.decode(
+            access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        ),
+    }
+
+    if include_bcrypt:
+        hashed = get_password_hash("benchmark-password")
+        benchmarks[f"verify_password (cost {settings.PASSWORD_BCRYPT_ROUNDS})"] = (
+            lambda: verify_password("benchmark-password", hashed)
+        )
+
+    # Same adapters FastAPI builds for response_model=List[...]
+    products_adapter = TypeAdapter(List[ProductResponse])
+    orders_adapter = TypeAdapter(List[OrderResponse])
+    for size in SIZES:
+        products = make_products(size)
+        orders = make_orders(size)
+        validated_products = products_adapter.validate_python(products, from_attributes=True)
+        validated_orders = orders_adapter.validate_python(orders, from_attributes=True)
+
+        benchmarks[f"ProductResponse validate x{size}"] = (
+            lambda p=products: products_adapter.validate_python(p, from_attributes=True)
+        )
+        benchmarks[f"ProductResponse dump_json x{size}"] = (
+            lambda v=validated_products: products_adapter.dump_json(v)
+        )
+        benchmarks[f"OrderResponse validate x{size}"] = (
+            lambda o=orders: orders_adapter.validate_python(o, from_attributes=True)
+        )
+        benchmarks[f"OrderResponse dump_json x{size}"] = (
+            lambda v=validated_orders: orders_adapter.dump_json(v)
+        )
+
+    return benchmarks
+
+
+def measure(func: Callable[[], object], min_time: float) -> dict:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    best = min(timer.repeat(repeat=3, number=number)) / number
+
+    # Peak traced memory above the starting point during one call
+    tracemalloc.start()
+    try:
+        func()
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    allocated = max(peak - baseline, 0)
+
+    return {
+        "ops_per_sec": round(1 / best, 2),
+        "us_per_op": round(best * 1e6, 3),
+        "allocated_bytes": allocated,
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    packages = {}
+    for name in PACKAGES:
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            packages[name] = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": packages,
+        "bcrypt_rounds": settings.PASSWORD_BCRYPT_ROUNDS,
+        "commit": commit,
+        "recorded_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, now in current["benchmarks"].items():
+        before = baseline.get("benchmarks", {}).get(name)
+        if before and now["ops_per_sec"] < before["ops_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {now['ops_per_sec']} ops/s < baseline {before['ops_per_sec']} ops/s"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--no-bcrypt", action="store_true", help="skip the (slow) bcrypt benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing repeat")
+    parser.add_argument("--output", help="write results JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown, 0.15 = 15%%")
+    args = parser.parse_args()
+
+    results = {}
+    for name, func in build_benchmarks(include_bcrypt=not args.no_bcrypt).items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(func, args.min_time)
+        print(
+            f"{name:<40} {results[name]['ops_per_sec']:>14,.1f} ops/s"
+            f" {results[name]['allocated_bytes']:>12,} B/op",
+            file=sys.stderr,
+        )
+
+    report = {"meta": environment(), "benchmarks": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(report, indent=2) + "\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        ignored = {"commit", "recorded_at"}
+        for key, value in report["meta"].items():
+            recorded = baseline.get("meta", {}).get(key)
+            if key not in ignored and recorded != value:
+                print(f"WARNING baseline {key} {recorded} != {value}", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
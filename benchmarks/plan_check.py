@@ -0,0 +1,126 @@
+"""
+Query plan regression check for the product list queries.
+
+Runs EXPLAIN on the statements GET /products/ generates (every sortable
+field in both directions, with and without search, and the structured
+filters) against the database configured in .env / DATABASE_URL, and
+fails (exit code 1) when a plan sequentially scans a large table or sorts
+a large input, i.e. when an index stopped backing the query:
+
+    alembic upgrade head
+    python -m benchmarks.plan_check --analyze
+    python -m benchmarks.plan_check --min-rows 50000
+
+Plans only mean something with realistic volume and statistics, so seed
+the database first and pass --analyze after loading. pytest runs it too
+(tests/test_plan_check.py), skipping it when the database is unreachable.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from app.db import queries
+from app.db import session as db_session
+
+
+def cases() -> Iterator[Tuple[str, object]]:
+    for search in (None, "acme"):
+        for sort_by in (None, *queries.SORTABLE_FIELDS):
+            for sort_order in ("asc", "desc"):
+                if sort_by is None and sort_order == "desc":
+                    continue
+                label = f"sort={sort_by or 'default'} {sort_order}"
+                if search:
+                    label += f" search={search!r}"
+                yield label, queries.product_list(0, 100, search, sort_by, sort_order)
+    yield "deep page", queries.product_list(10_000, 100)
+
+    filter_cases = {
+        "category": queries.ProductFilters(category="Electronics"),
+        "category+price": queries.ProductFilters(category="Electronics", price_min=10, price_max=100),
+        "vendors+price": queries.ProductFilters(vendors=("Acme", "Globex"), price_max=100),
+        "in_stock": queries.ProductFilters(in_stock=True),
+        "in_stock+category": queries.ProductFilters(category="Electronics", in_stock=True),
+        "rating_min": queries.ProductFilters(rating_min=4.5),
+    }
+    for name, filters in filter_cases.items():
+        yield f"filter={name}", queries.product_list(0, 100, filters=filters)
+        yield f"filter={name} sort=price", queries.product_list(0, 100, None, "price", "asc", filters)
+
+
+def walk(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+def problems(plan: dict, table_rows: dict, min_rows: int) -> List[str]:
+    found = []
+    for node in walk(plan):
+        node_type = node["Node Type"]
+        if node_type == "Seq Scan":
+            relation = node.get("Relation Name")
+            if table_rows.get(relation, 0) >= min_rows:
+                found.append(f"Seq Scan on {relation} (~{table_rows[relation]:.0f} rows)")
+        elif node_type in ("Sort", "Incremental Sort"):
+            input_rows = sum(child.get("Plan Rows", 0) for child in node.get("Plans", []))
+            if input_rows >= min_rows:
+                found.append(f"{node_type} over ~{input_rows:.0f} rows ({node.get('Sort Key')})")
+    return found
+
+
+async def run(min_rows: int, analyze: bool) -> List[str]:
+    db_session.init_engine()
+    failures = []
+    dialect = postgresql.dialect()
+    try:
+        async with db_session.AsyncSessionLocal() as session:
+            if analyze:
+                await session.execute(text("ANALYZE products"))
+            result = await session.execute(
+                text("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'")
+            )
+            table_rows = dict(result.all())
+
+            for label, stmt in cases():
+                sql = stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+                result = await session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+                plan = result.scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                root = plan[0]["Plan"]
+                found = problems(root, table_rows, min_rows)
+                status = "FAIL" if found else "ok"
+                print(f"{status:<4} {label:<40} cost={root['Total Cost']:.0f}")
+                for problem in found:
+                    failures.append(f"{label}: {problem}")
+            await session.rollback()
+    finally:
+        await db_session.dispose_engine()
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--min-rows",
+        type=int,
+        default=10_000,
+        help="tables/sort inputs at least this large must be index backed",
+    )
+    parser.add_argument("--analyze", action="store_true", help="ANALYZE products first")
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args.min_rows, args.analyze))
+    for failure in failures:
+        print(f"\nFAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
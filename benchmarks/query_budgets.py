@@ -0,0 +1,119 @@
+"""
+Query budget check for the API endpoints.
+
+Runs every endpoint once in-process against the database configured in
+.env / DATABASE_URL and fails (exit code 1) when an endpoint issues more
+SQL statements than its budget. Run it in CI after `alembic upgrade head`:
+
+    pip install -r requirements-dev.txt
+    python -m benchmarks.query_budgets
+
+pytest runs it too (tests/test_query_budgets.py), skipping it when the
+database is unreachable.
+"""
+import asyncio
+import sys
+import uuid
+
+import httpx
+
+from app.core.config import settings
+from app.core.sql_stats import query_budget
+from app.main import app
+
+API = settings.API_V1_STR
+
+# Statements per request, including the get_current_user lookup
+BUDGETS = {
+    "POST /auth/register": 3,
+    "POST /auth/login": 2,
+    "GET /auth/me": 1,
+    "POST /products/": 2,
+    "GET /products/": 2,
+    "GET /products/{id}": 2,
+    "GET /products/batch": 2,
+    "PUT /products/{id}": 2,
+    "POST /products/orders": 2,
+    "GET /products/orders/": 2,
+    "DELETE /products/{id}": 2,
+}
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+    # Warm-up queries would otherwise run during the first checks
+    deadline = asyncio.get_running_loop().time() + timeout
+    while (await client.get("/ready")).status_code != 200:
+        if asyncio.get_running_loop().time() > deadline:
+            raise RuntimeError(f"App not ready after {timeout:.0f} s")
+        await asyncio.sleep(0.1)
+
+
+async def run() -> list:
+    failures = []
+    suffix = uuid.uuid4().hex[:8]
+    transport = httpx.ASGITransport(app=app)
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://budget") as client:
+            await wait_until_ready(client)
+
+            async def call(name: str, method: str, url: str, **kwargs) -> httpx.Response:
+                try:
+                    with query_budget(BUDGETS[name], name) as stats:
+                        response = await client.request(method, f"{API}{url}", **kwargs)
+                except AssertionError as exc:
+                    failures.append(str(exc))
+                    return response
+                response.raise_for_status()
+                print(f"{name:<28} {stats.count:>2} / {BUDGETS[name]} queries")
+                return response
+
+            password = "budget-password"
+            await call("POST /auth/register", "POST", "/auth/register", json={
+                "email": f"budget-{suffix}@example.com",
+                "username": f"budget-{suffix}",
+                "full_name": "Query Budget",
+                "password": password,
+            })
+            login = await call("POST /auth/login", "POST", "/auth/login", json={
+                "username": f"budget-{suffix}",
+                "password": password,
+            })
+            client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+
+            await call("GET /auth/me", "GET", "/auth/me")
+            product = (await call("POST /products/", "POST", "/products/", json={
+                "name": "Budget product",
+                "category": "Budget",
+                "vendor": "Budget vendor",
+                "article": f"BUDGET-{suffix}",
+                "price": 10.0,
+                "quantity": 10,
+            })).json()
+            product_id = product["id"]
+
+            await call("GET /products/", "GET", "/products/")
+            await call("GET /products/{id}", "GET", f"/products/{product_id}")
+            await call("GET /products/batch", "GET", f"/products/batch?ids={product_id},0")
+            await call("PUT /products/{id}", "PUT", f"/products/{product_id}", json={
+                "price": 12.5,
+            })
+            await call("POST /products/orders", "POST", "/products/orders", json={
+                "product_id": product_id,
+                "quantity": 1,
+            })
+            await call("GET /products/orders/", "GET", "/products/orders/")
+            await call("DELETE /products/{id}", "DELETE", f"/products/{product_id}")
+
+    return failures
+
+
+def main() -> int:
+    failures = asyncio.run(run())
+    for failure in failures:
+        print(f"\nFAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# gunicorn_conf.py
+# Production server settings: gunicorn -c gunicorn_conf.py app.main:app
+import os
+import shutil
+import tempfile
+
+# prometheus_client picks its multiprocess value storage at import time, so
+# the directory must be in the environment before anything imports it.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "prometheus-multiproc"),
+)
+
+from prometheus_client import multiprocess  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.server import check_connection_budget, worker_count  # noqa: E402
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = worker_count()
+
+# Workers read WEB_CONCURRENCY to split DB_CONNECTION_BUDGET between them
+# (see app.db.session.pool_limits), so workers x pool never exceeds it.
+# They are forked from this process and inherit the settings it already
+# imported above, so set it there too, not only in the environment.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+settings.WEB_CONCURRENCY = workers
+check_connection_budget(workers)
+
+# On SIGTERM gunicorn stops accepting connections and gives in-flight
+# requests graceful_timeout seconds to finish; each worker then runs the
+# lifespan shutdown, which disposes the engine.
+graceful_timeout = settings.GRACEFUL_TIMEOUT
+timeout = settings.WORKER_TIMEOUT
+keepalive = 5
+
+# Recycle workers after N requests to bound memory growth (0 disables);
+# jitter keeps them from restarting all at once.
+max_requests = settings.WORKER_MAX_REQUESTS
+max_requests_jitter = settings.WORKER_MAX_REQUESTS_JITTER
+
+accesslog = "-"
+
+
+def on_starting(server):
+    # Wipe the multiprocess directory so samples of old workers are not
+    # aggregated into the new ones.
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,39 @@
+"""
+Tests marked `postgres` run against the database at DATABASE_URL, which
+must be migrated (`alembic upgrade head`); they are skipped when it can't
+be reached.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+
+
+def _postgres_available() -> bool:
+    if not settings.DATABASE_URL.startswith("postgresql+asyncpg://"):
+        return False
+
+    async def probe() -> None:
+        engine = create_async_engine(settings.DATABASE_URL, connect_args={"timeout": 3})
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(probe())
+    except Exception:
+        return False
+    return True
+
+
+def pytest_collection_modifyitems(config, items):
+    postgres = [item for item in items if "postgres" in item.keywords]
+    if postgres and not _postgres_available():
+        skip = pytest.mark.skip(reason="PostgreSQL at DATABASE_URL is not reachable")
+        for item in postgres:
+            item.add_marker(skip)
@@ -0,0 +1,8 @@
+from benchmarks import import_time
+
+
+def test_import_is_fast_and_side_effect_free():
+    total, app_self, modules = import_time.measure(runs=3)
+    slowest = sorted(modules.items(), key=lambda item: -item[1])[:5]
+    assert total <= import_time.TOTAL_BUDGET_MS, f"app.main import took {total:.0f} ms"
+    assert app_self <= import_time.APP_BUDGET_MS, f"app.* self time {app_self:.0f} ms: {slowest}"
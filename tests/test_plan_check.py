@@ -0,0 +1,12 @@
+import asyncio
+
+import pytest
+
+from benchmarks import plan_check
+
+
+@pytest.mark.postgres
+def test_product_list_plans_are_index_backed():
+    # Only meaningful on a seeded database (python -m benchmarks.datagen)
+    failures = asyncio.run(plan_check.run(min_rows=10_000, analyze=True))
+    assert not failures, "\n".join(failures)
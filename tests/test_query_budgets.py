@@ -0,0 +1,14 @@
+import asyncio
+
+import pytest
+
+from benchmarks import query_budgets
+
+
+@pytest.mark.postgres
+def test_endpoints_stay_within_query_budgets():
+    # Includes the single-statement writes: create, update and delete of a
+    # product and placing an order may each run one statement besides the
+    # user lookup
+    failures = asyncio.run(query_budgets.run())
+    assert not failures, "\n".join(failures)